@@ -3,17 +3,24 @@
 # Date: 2026/5/25 03:36:13 
 # LastEditTime: 2026/5/25 03:36:13
 
-import ctypes
-from ctypes import wintypes
 from itertools import zip_longest
 import os
-from queue import Queue
+import time
+from queue import Queue, Empty
 import sqlite3
 import threading
 import keyboard
 from . import data
 from . import data_rc
 from . import settings
+from . import scheduler
+from . import database
+from . import history
+from . import icons
+from . import search_cache
+from . import timeutil
+from . import process_watch
+from . import win32
 from src.mygui import my_window as win
 from PySide6.QtGui import *
 from PySide6.QtCore import *
@@ -32,22 +39,29 @@ class Aoe4mmr:
         self.settings_path = self.base_path / "settings.json"
         self.database_path = self.base_path / "database.db"
         self.database_queue = Queue()
+        self.database_flush_latency = 0.05  # 写入语句最长等待时间（秒），期间到达的语句合并提交
+        self.database_max_batch = 500
         self.initilize_database()
         self.player_mark_dic = {}
+        self.game_store = history.GameHistoryStore(self.database_path, self.database_queue)
+        self.search_cache = search_cache.PlayerSearchCache(self.database_path, self.database_queue)
         threading.Thread(target=self.write_to_db, daemon=True).start()
         self.settings = settings.Settings()
         self.settings.load(self.settings_path)                      
-        self.data = data.Data(self.gui_reload, self.settings.picked_profile_id, self.database_queue, self.map_dic, self.settings.profile_id.keys(), self.new_version)
-        self.game_process_check_timer = QTimer()
-        self.game_process_check_timer.setInterval(10000)
-        self.game_process_check_timer.timeout.connect(self.game_process_check_timer_timeout)
-        self.game_process_check_timer.start()
+        timeutil.set_display_timezone(self.settings.display_timezone)
+        self.data = data.Data(self.gui_reload, self.settings.picked_profile_id, self.database_queue, self.icons.map_names, self.settings.profile_id.keys(), self.new_version)
+        self.poll_scheduler = scheduler.PollScheduler(self.data.poll)
+        # 游戏未运行时低频扫描进程列表，运行后等待进程退出事件
+        self.process_watcher = process_watch.ProcessWatcher('RelicCardinal.exe', scan_interval=20)
+        self.process_watcher.process_started_signal.connect(self.on_game_process_started)
+        self.process_watcher.process_exited_signal.connect(self.on_game_process_exited)
         self.setupUI()
+        self.process_watcher.start()
         
     def setupUI(self):
         # 设置界面UI
-        self.mmr_window = win.MmrWindow(self.settings.picked_profile_id, self.civilization_icon_dic, self.rank_icon_dic, self.settings.window_location, self.player_mark_dic)
-        self.main_window = win.MyWindow(self.settings, self.civilization_icon_dic, self.map_dic, self.rank_icon_dic, self.database_queue, self.player_mark_dic)
+        self.mmr_window = win.MmrWindow(self.settings.picked_profile_id, self.icons, self.settings.window_location, self.player_mark_dic)
+        self.main_window = win.MyWindow(self.settings, self.icons, self.database_queue, self.player_mark_dic, self.game_store, self.search_cache)
         self.main_window.setWindowIcon(self.app_icon)
         self.main_window.setWindowTitle(self.app_name)
         self.main_window.keyboard_single.connect(self.on_hotkey_changed)
@@ -119,6 +133,7 @@ class Aoe4mmr:
         elif key == 'picked_profile_id':
             self.settings.picked_profile_id = values
             self.data.set_profile_id(values)
+            self.poll_scheduler.wake()
             self.mmr_window.tracking_id = values
         elif key == 'delete_profile_id':
             self.settings.delete_profile_id(values)
@@ -130,6 +145,7 @@ class Aoe4mmr:
             self.settings.update_profile_id(*player_info)
             self.settings.picked_profile_id = (player_info[0])
             self.data.set_profile_id(self.settings.picked_profile_id)
+            self.poll_scheduler.wake()
             self.main_window.left_menu.toolbutton_dic['home_button'][0].click()
             self.gui_reload(reason='reload player', data=self.settings.profile_id)
         except Exception as e:
@@ -137,72 +153,122 @@ class Aoe4mmr:
     
     def load_data_from_user_database(self):
         # 启动时，从数据库读取已保存的游戏对局数据，无数据则跳过
+        # 使用独立的只读连接，不与写入线程共用连接，也不会被未完成的写入阻塞
+        threading.Thread(target=self.load_player_mark, daemon=True).start()
+        conn, cur = self.connect_to_userdb(readonly=True)
         try:
-            self.cur.execute('select profile_id, flag, reason, create_time from player_mark')
-            player_marks = self.cur.fetchall()
-            for player_mark in player_marks:
-                profile_id, flag, reason, create_time = player_mark
-                self.player_mark_dic[profile_id] = (flag, reason, create_time)
+            # 一次查询取回整局数据，count(*) over () 即为对局人数
+            rows = cur.execute('select game_id, count(*) over (), map, kind, player, civilization, profile_id, player_mmr, win_rate '
+                               'from last_game order by team, player').fetchall()
+            if rows:
+                game_id, game_mode, map_name, kind = rows[0][:4]
+                player_data = [(player, civilization, profile_id, player_mmr, win_rate, kind)
+                               for *_, player, civilization, profile_id, player_mmr, win_rate in rows]
+                last_game_data = (map_name, game_id, game_mode, player_data, kind)
+                self.gui_reload('reload game', last_game_data)
+                self.data.last_game_id = game_id
+                QTimer.singleShot(0, self.mmr_window.hide)
         except Exception as e:
-            print('error when read player mark data:', e)
+            print('error when read game data:', e)
+        finally:
+            conn.close()
+
+    def load_player_mark(self):
+        # 在后台连接中批量读取玩家标记，读取结果通过信号交给界面线程合并，后台线程不修改界面共用的player_mark_dic
+        conn, cur = self.connect_to_userdb(readonly=True)
         try:
-            self.cur.execute('select game_id from last_game limit 1')
-            game_id = self.cur.fetchone()[0]
-            self.cur.execute('select count(1) from last_game')
-            game_mode = self.cur.fetchone()[0]
-            self.cur.execute('select map from last_game limit 1')
-            map_name = self.cur.fetchone()[0]
-            self.cur.execute('select kind from last_game limit 1')
-            kind = self.cur.fetchone()[0]
-            self.cur.execute('select player, civilization, profile_id, player_mmr, win_rate, kind from last_game order by team, player')
-            player_data = self.cur.fetchall()
-            last_game_data = (map_name, game_id, game_mode, player_data, kind)
-            self.gui_reload('reload game', last_game_data)
-            self.data.last_game_id = game_id
-            QTimer.singleShot(0, self.mmr_window.hide)
+            player_marks = cur.execute('select profile_id, flag, reason, create_time from player_mark').fetchall()
+            player_marks = {profile_id: (flag, reason, create_time) for profile_id, flag, reason, create_time in player_marks}
+            self.mmr_window.player_mark_reload_signal.emit(player_marks)
+            self.main_window.menu_page.player_mark_reload_signal.emit(player_marks)
         except Exception as e:
-            print('error when read game data:', e)
+            print('error when read player mark data:', e)
+        finally:
+            conn.close()
     
     def write_to_db(self):
+        # 数据库写入线程：合并队列中等待的语句，在一个事务中执行并只提交一次
         self.conn, self.cur = self.connect_to_userdb()
         while True:
-            sql, parameters = self.database_queue.get()
-            if sql:
-                try:
-                    if parameters:
-                        self.cur.execute(sql, parameters)
+            statements = self.drain_database_queue()
+            try:
+                for sql, parameters_list in self.group_statements(statements):
+                    if len(parameters_list) > 1:
+                        self.cur.executemany(sql, parameters_list)
+                    elif parameters_list[0]:
+                        self.cur.execute(sql, parameters_list[0])
                     else:
                         self.cur.execute(sql)
-                    self.conn.commit()
-                except Exception as e:
-                    print(f'error: {e}, when execute sql: {sql}, parameters: {parameters}')
-                finally:
-                    continue
-                
-    def connect_to_userdb(self):
-        conn = sqlite3.connect(self.database_path, check_same_thread=False)
-        cur = conn.cursor()
-        return conn, cur
+                self.conn.commit()
+            except Exception as e:
+                # 批量执行失败时回滚，再逐条执行，避免一条错误语句影响其他写入
+                print(f'error: {e}, when execute batch sql, retry one by one')
+                self.conn.rollback()
+                for sql, parameters in statements:
+                    try:
+                        if parameters:
+                            self.cur.execute(sql, parameters)
+                        else:
+                            self.cur.execute(sql)
+                        self.conn.commit()
+                    except Exception as e:
+                        print(f'error: {e}, when execute sql: {sql}, parameters: {parameters}')
+
+    def drain_database_queue(self):
+        # 阻塞等待第一条语句，之后最多再等待database_flush_latency秒收集后续语句
+        # 队列元素可以是单条 (sql, parameters)，也可以是由多条语句组成的list
+        statements = []
+        item = self.database_queue.get()
+        flush_time = time.monotonic() + self.database_flush_latency
+        while True:
+            if isinstance(item, list):
+                statements.extend(item)
+            elif item and item[0]:
+                statements.append(item)
+            remaining = flush_time - time.monotonic()
+            if len(statements) >= self.database_max_batch or (remaining <= 0 and statements):
+                return statements
+            try:
+                item = self.database_queue.get(timeout=remaining) if remaining > 0 else self.database_queue.get()
+            except Empty:
+                if statements:
+                    return statements
+                item = self.database_queue.get()
+                flush_time = time.monotonic() + self.database_flush_latency
+
+    @staticmethod
+    def group_statements(statements):
+        # 将连续的相同sql合并，以便使用executemany
+        groups = []
+        for sql, parameters in statements:
+            if groups and groups[-1][0] == sql and parameters and groups[-1][1][-1]:
+                groups[-1][1].append(parameters)
+            else:
+                groups.append((sql, [parameters]))
+        return groups
+
+    def connect_to_userdb(self, readonly=False):
+        return database.connect(self.database_path, readonly)
     
-    def initilize_database(self):        
-        conn, cur = self.connect_to_userdb()
+    def initilize_database(self):
+        # 按版本执行数据库迁移，在原库上升级表结构，保留已有的玩家标记和对局数据
+        conn = None
         try:
-            cur.execute('select name, version from version where name = "database"')
-            database_version = cur.fetchone()[1]
-        except Exception as e:
-            database_version = None
-        if database_version != self.database_version:
-            conn.close()
-            os.remove(self.database_path)
             conn, cur = self.connect_to_userdb()
-            cur.execute(
-                'create table if not exists last_game (game_id INTEGER NOT NULL, player TEXT, win_rate TEXT, civilization TEXT, map TEXT, profile_id INTEGER,'
-                'player_mmr TEXT, team TEXT, kind Text, PRIMARY KEY (game_id,player))')
-            cur.execute('create table if not exists version (name TEXT NOT NULL,version TEXT, PRIMARY KEY (name))')
-            cur.execute('create table if not exists player_mark (profile_id text NOT NULL, flag INTEGER, reason TEXT, create_time INTEGER, backup1 TEXT, backup2 TEXT, backup3 TEXT, PRIMARY KEY (profile_id))')
-            cur.execute("insert into version(name, version) values(?, ?)", ('database', self.database_version))
-            conn.commit()
-        conn.close()
+            database.migrate(conn, self.database_version)
+        except sqlite3.DatabaseError as e:
+            # 只有数据库文件损坏时才删除重建；被锁定、磁盘错误、迁移语句错误等直接抛出，不删除用户数据
+            if not database.is_corrupt(e):
+                raise
+            print('error when migrate database:', e)
+            if conn is not None:
+                conn.close()
+            database.remove_database(self.database_path)
+            conn, cur = self.connect_to_userdb()
+            database.migrate(conn, self.database_version)
+        finally:
+            if conn is not None:
+                conn.close()
     
     def on_tray_icon_clicked(self, reason):
         # 双击任务栏图标时，显示/隐藏界面
@@ -224,7 +290,7 @@ class Aoe4mmr:
         
     def toggle_window(self, checked=False, window=None):        
         window = self.mmr_window if window is None else window
-        if window == self.mmr_window and not self.check_process():
+        if window == self.mmr_window and not self.process_watcher.is_running():
             return
         if window == self.mmr_window:
             self.mmr_window.toggle_window_signal.emit()
@@ -239,23 +305,22 @@ class Aoe4mmr:
         keyboard.add_hotkey(self.settings.hotkey, self.toggle_window)
         self.added_hotkey = self.settings.hotkey
     
-    def game_process_check_timer_timeout(self):
-        if self.check_process():
-            if self.data.quit_signal:
-                self.data.quit_signal = False
-                self.start_data_thread()
-        else:
-            if not self.data.quit_signal:
-                self.data.quit_signal = True
-                self.mmr_window.hide()
+    def on_game_process_started(self, pid):
+        if self.data.quit_signal:
+            self.data.quit_signal = False
+            self.start_polling()
+
+    def on_game_process_exited(self, pid):
+        if not self.data.quit_signal:
+            self.data.quit_signal = True
+            self.poll_scheduler.stop()
+            self.mmr_window.hide()
 
-    def start_data_thread(self):
-        alive = False
-        if hasattr(self, "data_thread"):
-            alive = self.data_thread.is_alive()
-        if not alive:
-            self.data_thread = threading.Thread(target=self.data.worker, daemon=True)
-            self.data_thread.start()
+    def start_polling(self):
+        # 游戏进程出现时，立即开始轮询对局数据
+        print('data polling start')
+        self.data.version_player_check()
+        self.poll_scheduler.start()
         
     def close(self, checked=False):
         self.tray_icon.hide()
@@ -279,7 +344,7 @@ class Aoe4mmr:
             try:
                 with open(pid_path, 'r', encoding='utf-8') as f:
                     pid = int(f.read())
-                if __class__.get_process_name_by_pid(pid) in ('Aoe4mmr.exe', 'python.exe'):   # NOQA
+                if win32.get_process_name(pid) in ('Aoe4mmr.exe', 'python.exe'):
                     return False
                 else:
                     with open(pid_path, 'w', encoding='utf-8') as f:
@@ -291,7 +356,7 @@ class Aoe4mmr:
                 return True
             
     def get_all_rc_data(self):
-        # 连接资源数据库，获取地图和图标数据
+        # 连接资源数据库，地图名称启动时读取，图标按需读取
         # 从 .qrc 资源中读取二进制数据
         file = QFile(':/data/resources/data.pck')
         if not file.open(QIODevice.ReadOnly):
@@ -305,142 +370,11 @@ class Aoe4mmr:
             data_conn.deserialize(db_data)
         except AttributeError as e:
             print('error when open db:', {e})
-        data_cur = data_conn.cursor()
-        
+        # 资源数据库保持打开，图标在首次使用时才读取
+        self.icons = icons.IconRepository(data_conn)
         self.app_icon = QPixmap()
-        self.app_icon.loadFromData(data_cur.execute('select data from t_icon where type = ?', ('app_icon',)).fetchone()[0])
-        
-        civilization_icon_rs = data_cur.execute('select name, data from t_icon where type = ?', ('civilization',))
-        self.civilization_icon_dic = {row[0]: row[1] for row in civilization_icon_rs.fetchall()}
-        
-        rank_icon_rs = data_cur.execute('select name, data from t_icon where type in (?,?) ', ('rank', 'team_rank'))
-        self.rank_icon_dic = {row[0]: row[1] for row in rank_icon_rs.fetchall()}
-        
-        map_dic_rs = data_cur.execute('select english_name, chinese_name, icon from t_map', )
-        self.map_dic = {row[0]: (row[1], row[2]) for row in map_dic_rs.fetchall()}
-        
-        data_conn.close()
-        del data_conn
+        self.app_icon.loadFromData(self.icons.app_icon())
         data_rc.qCleanupResources()
-        
-    @staticmethod
-    def check_process(process_name='RelicCardinal.exe'):
-        """检查指定进程是否存在（Unicode API）"""
-        TH32CS_SNAPPROCESS = 0x00000002
-        INVALID_HANDLE_VALUE = ctypes.c_void_p(-1).value
-        kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
-
-        class PROCESSENTRY32W(ctypes.Structure):
-            _fields_ = [
-                ("dwSize", wintypes.DWORD),
-                ("cntUsage", wintypes.DWORD),
-                ("th32ProcessID", wintypes.DWORD),
-                ("th32DefaultHeapID", ctypes.c_void_p),
-                ("th32ModuleID", wintypes.DWORD),
-                ("cntThreads", wintypes.DWORD),
-                ("th32ParentProcessID", wintypes.DWORD),
-                ("pcPriClassBase", ctypes.c_long),
-                ("dwFlags", wintypes.DWORD),
-                ("szExeFile", ctypes.c_wchar * wintypes.MAX_PATH),
-            ]
-        # 指定函数签名
-
-        kernel32.CreateToolhelp32Snapshot.argtypes = [
-            wintypes.DWORD,
-            wintypes.DWORD,
-        ]
-        kernel32.CreateToolhelp32Snapshot.restype = wintypes.HANDLE
-        kernel32.Process32FirstW.argtypes = [
-            wintypes.HANDLE,
-            ctypes.POINTER(PROCESSENTRY32W),
-        ]
-        kernel32.Process32FirstW.restype = wintypes.BOOL
-        kernel32.Process32NextW.argtypes = [
-            wintypes.HANDLE,
-            ctypes.POINTER(PROCESSENTRY32W),
-        ]
-        kernel32.Process32NextW.restype = wintypes.BOOL
-        kernel32.CloseHandle.argtypes = [wintypes.HANDLE]
-        kernel32.CloseHandle.restype = wintypes.BOOL
-        # 创建进程快照
-        hSnapshot = kernel32.CreateToolhelp32Snapshot(
-            TH32CS_SNAPPROCESS,
-            0,
-        )
-        if hSnapshot == INVALID_HANDLE_VALUE:
-            raise ctypes.WinError(ctypes.get_last_error())
-        try:
-            pe32 = PROCESSENTRY32W()
-            pe32.dwSize = ctypes.sizeof(PROCESSENTRY32W)
-            if not kernel32.Process32FirstW(hSnapshot, ctypes.byref(pe32)):
-                return False
-            process_name = process_name.lower()
-            while True:
-                if pe32.szExeFile.lower() == process_name:
-                    return True
-                if not kernel32.Process32NextW(hSnapshot, ctypes.byref(pe32)):
-                    break
-            return False
-        finally:
-            kernel32.CloseHandle(hSnapshot)
-
-    @staticmethod
-    def get_process_name_by_pid(pid):
-        # 定义常量
-        TH32CS_SNAPPROCESS = 0x00000002
-        INVALID_HANDLE_VALUE = ctypes.c_void_p(-1).value
-        # 定义结构体
-        class PROCESSENTRY32(ctypes.Structure):
-            _fields_ = [
-                ('dwSize', ctypes.wintypes.DWORD),
-                ('cntUsage', ctypes.wintypes.DWORD),
-                ('th32ProcessID', ctypes.wintypes.DWORD),
-                ('th32DefaultHeapID', ctypes.POINTER(ctypes.wintypes.ULONG)),  # 使用指针类型
-                ('th32ModuleID', ctypes.wintypes.DWORD),
-                ('cntThreads', ctypes.wintypes.DWORD),
-                ('th32ParentProcessID', ctypes.wintypes.DWORD),
-                ('pcPriClassBase', ctypes.wintypes.LONG),
-                ('dwFlags', ctypes.wintypes.DWORD),
-                ('szExeFile', ctypes.c_char * 260)  # 进程名缓冲区
-            ]
-        # 加载kernel32并设置函数原型
-        kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
-        # 设置函数原型
-        kernel32.CreateToolhelp32Snapshot.restype = ctypes.wintypes.HANDLE
-        kernel32.CreateToolhelp32Snapshot.argtypes = [ctypes.wintypes.DWORD, ctypes.wintypes.DWORD]
-        kernel32.Process32First.restype = ctypes.wintypes.BOOL
-        kernel32.Process32First.argtypes = [ctypes.wintypes.HANDLE, ctypes.POINTER(PROCESSENTRY32)]
-        kernel32.Process32Next.restype = ctypes.wintypes.BOOL
-        kernel32.Process32Next.argtypes = [ctypes.wintypes.HANDLE, ctypes.POINTER(PROCESSENTRY32)]
-        kernel32.CloseHandle.restype = ctypes.wintypes.BOOL
-        kernel32.CloseHandle.argtypes = [ctypes.wintypes.HANDLE]
-        # 创建进程快照
-        hSnapshot = kernel32.CreateToolhelp32Snapshot(TH32CS_SNAPPROCESS, 0)
-        # 检查快照句柄是否有效
-        if hSnapshot == INVALID_HANDLE_VALUE or not hSnapshot:
-            error_code = ctypes.get_last_error()
-            if error_code:
-                raise ctypes.WinError(error_code)
-            return None
-        pe32 = PROCESSENTRY32()
-        pe32.dwSize = ctypes.sizeof(PROCESSENTRY32)
-        # 遍历进程列表
-        process_name = None
-        # 获取第一个进程
-        if kernel32.Process32First(hSnapshot, ctypes.byref(pe32)):
-            while True:
-                # 检查是否匹配PID
-                if pe32.th32ProcessID == pid:
-                    # 提取文件名部分（去掉路径）
-                    full_name = pe32.szExeFile.decode('latin-1', errors='ignore')
-                    process_name = full_name.split('\\')[-1]
-                    break
-                # 获取下一个进程
-                if not kernel32.Process32Next(hSnapshot, ctypes.byref(pe32)):
-                    break
-        # 关闭句柄
-        kernel32.CloseHandle(hSnapshot)
-        return process_name
     
     
 class MouseFilter(QObject):
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# Author: B_Snowflake
+# Date: 2026/10/18
+# LastEditTime: 2026/10/18
+
+import time
+import threading
+from collections import OrderedDict
+
+
+class TTLCache:
+    # 线程安全的内存缓存：条目超过ttl秒后失效，容量满时淘汰最久未使用的条目（LRU）
+    def __init__(self, maxsize=512, ttl=600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.data = OrderedDict()  # {key: (过期时间, value)}
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            item = self.data.get(key)
+            if item is None:
+                return default
+            expire_time, value = item
+            if expire_time < time.monotonic():
+                del self.data[key]
+                return default
+            self.data.move_to_end(key)
+            return value
+
+    def put(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        with self.lock:
+            self.data[key] = (time.monotonic() + ttl, value)
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self.lock:
+            item = self.data.pop(key, None)
+        return default if item is None else item[1]
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __len__(self):
+        return len(self.data)
@@ -5,17 +5,17 @@
 # Author: B_Snowflake
 # Date: 2025/4/2
 
-import pytz
 import json
+import hashlib
 import time
 import sqlite3
 import threading
 from . import settings
+from . import http_client
+from . import leaderboard
+from . import scheduler
 import traceback
-import requests
-import func_timeout
-from retrying import retry
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 
 class Data:
@@ -27,11 +27,23 @@ class Data:
         self.new_version_func = new_version_func
         self.profile_id = profile_id  # 追踪游戏对局数据的账户PID（由主线程设定）
         self.gui_reload = gui_reload
-        self.map_dic = {key: values[0] for key, values in map_dic.items()}  # 地图中英文对照表
+        self.map_dic = map_dic  # 地图中英文对照表
         self.version_check_url = 'https://github.com/B-Snowflake/aoe4mmr/releases/latest'
         self.version_check_time = None
         self.game_data_request_time = 0
         self.game_data_max_request_time = 2
+        self.poll_timeout = 30  # 单次轮询的总时间预算（秒），所有请求及重试共享
+        # 最新对局接口的缓存校验信息（ETag / Last-Modified / 响应体摘要）及上次解析结果
+        self.last_game_url = None
+        self.last_game_etag = None
+        self.last_game_modified = None
+        self.last_game_digest = None
+        self.last_game_json = None
+        self.last_game_status_code = None
+        self.client = http_client.get_client()
+        # 单局最多8名玩家，线程数与之对应
+        self.executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='leaderboard')
+        self.leaderboard = leaderboard.LeaderboardBatcher(self.get_response, self.executor)
         self.version_player_check()
 
     def set_profile_id(self, profile_id):
@@ -45,19 +57,10 @@ class Data:
     def new_version_check(self):
         if self.version_check_time is None or (time.time() - self.version_check_time) > 86400:
             self.version_check_time = time.time()
-            response = requests.get(self.version_check_url, allow_redirects=True)
+            response = self.client.get(self.version_check_url, allow_redirects=True)
             latest_version = response.url.split("/")[-1]
             self.new_version_func(latest_version)
 
-    @staticmethod
-    def timezone_convert(utc_time_str):
-        # 将UTC时间转换到北京时间
-        utc_dt = datetime.strptime(utc_time_str, "%Y-%m-%dT%H:%M:%S.%fZ")
-        utc_dt = utc_dt.replace(tzinfo=pytz.UTC)
-        beijing_tz = pytz.timezone("Asia/Shanghai")
-        beijing_dt = utc_dt.astimezone(beijing_tz)
-        return beijing_dt.strftime("%Y-%m-%d %H:%M:%S")
-
     def update_player_name(self):
         # 启动时更新已保存的账户名（考虑用户可能会更改ID）
         result = {}
@@ -73,112 +76,121 @@ class Data:
                 result[profile_id] = settings.ProfileId(profile_id, name)
         self.gui_reload('reload player', result)
 
-    @retry(stop_max_attempt_number=10)
-    def get_response(self, url):
-        # 从API接口获取数据，最多重试10次
+    def get_response(self, url, headers=None, deadline=None):
+        # 从API接口获取数据，网络异常时在截止时间内重试
         try:
-            response = requests.get(url=url)
+            response = self.client.get_with_retry(url, deadline=deadline, headers=headers)
             return response
         except Exception as network_error:
             print(network_error)
 
-    @func_timeout.func_set_timeout(80)
+    def get_last_game(self, deadline=None):
+        # 使用条件请求获取最新对局，内容未变化时（304或响应体相同）直接复用上次的解析结果
+        url = f'https://aoe4world.com/api/v0/players/{self.profile_id}/games/last'
+        same_url = url == self.last_game_url
+        headers = {}
+        if same_url and self.last_game_etag:
+            headers['If-None-Match'] = self.last_game_etag
+        if same_url and self.last_game_modified:
+            headers['If-Modified-Since'] = self.last_game_modified
+        response = self.get_response(url=url, headers=headers, deadline=deadline)
+        self.last_game_status_code = response.status_code if response is not None else None
+        if not response:
+            return None
+        if response.status_code == 304 and same_url:
+            return self.last_game_json
+        if response.status_code != 200:
+            print(f'request last game failed, status code: {response.status_code}')
+            return None
+        digest = hashlib.blake2b(response.content, digest_size=16).digest()
+        if not same_url or digest != self.last_game_digest:
+            self.last_game_json = json.loads(response.content.decode())
+        self.last_game_url = url
+        self.last_game_digest = digest
+        self.last_game_etag = response.headers.get('ETag')
+        self.last_game_modified = response.headers.get('Last-Modified')
+        return self.last_game_json
+
     def get_data(self):
-        # 从API接口获取最新的游戏对局数据
+        # 从API接口获取最新的游戏对局数据，返回本次轮询的状态
         player_data_list = []
         game_data_list = []
         error = False
+        deadline = http_client.Deadline(self.poll_timeout)
         try:
             # 获取最新游戏对局
-            last_game = self.get_response(url=f'https://aoe4world.com/api/v0/players/{self.profile_id}/games/last')
-            if last_game:
-                last_game_json = json.loads(last_game.content.decode())
-                game_id = last_game_json['game_id']
-                # 如果该局游戏是新开的，则请求该对局数据
-                # if game_id != self.last_game_id and last_game_json['ongoing']:
-                if game_id != self.last_game_id:
-                    map_english = last_game_json['map']
-                    map_chinese = self.map_dic.get(map_english, map_english)
-                    teams = last_game_json['teams']
-                    last_game_kind = last_game_json['kind']
-                    # 根据游戏类型，来拼接请求url
-                    if last_game_kind == 'rm_1v1':
-                        kind = 'rm_solo'
-                    elif last_game_kind == 'rm_2v2' or last_game_kind == 'rm_3v3' or last_game_kind == 'rm_4v4':
-                        kind = 'rm_team'
-                    elif last_game_kind == 'qm_ffa_nomad':
-                        kind = 'qm_ffa'
-                    else:
-                        kind = last_game_kind
-                    i = 0
-                    player_counts = 0
-                    request_again_count = 0
-                    for elements in teams:
-                        i += 1
-                        for element in elements:
-                            player_counts += 1
-                            player = str(element['name'])
-                            if element['rating']:
-                                player_mmr = element['rating']
-                            else:
-                                player_mmr = '--'
-                            civilization = element['civilization']
-                            player_profile_id = element['profile_id']
-                            # 根据游戏类型（排位、快速比赛、3V3/4V4/2V2/1V1）请求玩家mmr
-                            player_leaderboards = self.get_response(f'https://aoe4world.com/api/v0/leaderboards/{kind}?profile_id={player_profile_id}')
-                            player_leaderboards_json = json.loads(player_leaderboards.content.decode())
-                            if data:= player_leaderboards_json.get('players'):
-                                # player_mmr = player_leaderboards_json['players'][0]['rating']
-                                win_rate = data[0]['win_rate']
-                            else:
-                                # player_mmr = '--'
-                                win_rate = '--'
-                            values = (game_id, player, str(win_rate), civilization, map_chinese, str(player_profile_id), str(player_mmr), str(i), kind)
-                            insert_sql = ("INSERT INTO last_game ( game_id, player, win_rate, civilization, map, profile_id, player_mmr, team, kind ) "
-                                          "VALUES ( ?, ?, ?, ?, ?, ?, ?, ?, ? )")
-                            game_data_list.append((insert_sql, values))
-                            player_data_list.append((str(player), civilization, str(player_profile_id), str(player_mmr), str(win_rate), str(kind)))
-                    # 数据校验，如果本次请求的数据缺失，终止
-                    if last_game_kind in ('rm_1v1', 'qm_1v1') and player_counts != 2:
-                        error = True
-                    elif last_game_kind in ('rm_2v2', 'qm_2v2') and player_counts != 4:
-                        error = True
-                    elif last_game_kind in ('rm_3v3', 'qm_3v3') and player_counts != 6:
-                        error = True
-                    elif last_game_kind in ('rm_4v4', 'qm_4v4') and player_counts != 8:
-                        error = True
-                    if not error:
-                        self.game_data_request_time += 1
-                        print(f'{game_id}:第{self.game_data_request_time}次数据请求完成')
-                        if self.game_data_request_time == self.game_data_max_request_time:
-                            self.last_game_id = game_id
-                            # 写入数据库
-                            for insert_sql, values in game_data_list:
-                                self.database_queue.put((insert_sql, values))
-                        # 重载gui界面
-                        last_game_data = (map_chinese, str(game_id), len(player_data_list), player_data_list, kind)
-                        self.gui_reload('reload game', last_game_data)
-                        self.database_queue.put(("delete from last_game where game_id <> ?", (game_id,)))
-                    else:
-                        print(f'game_id:{game_id}, 本次获取的数据不完整')
-                        return
+            last_game_json = self.get_last_game(deadline)
+            if not last_game_json:
+                return scheduler.POLL_THROTTLED if self.last_game_status_code == 429 else scheduler.POLL_ERROR
+            ongoing_state = scheduler.POLL_ONGOING if last_game_json.get('ongoing') else scheduler.POLL_IDLE
+            game_id = last_game_json['game_id']
+            # 如果该局游戏是新开的，则请求该对局数据
+            # if game_id != self.last_game_id and last_game_json['ongoing']:
+            if game_id == self.last_game_id:
+                return ongoing_state
+            map_english = last_game_json['map']
+            map_chinese = self.map_dic.get(map_english, map_english)
+            teams = last_game_json['teams']
+            last_game_kind = last_game_json['kind']
+            # 根据游戏类型，来拼接请求url
+            kind = leaderboard.leaderboard_kind(last_game_kind)
+            players = []
+            for i, elements in enumerate(teams, 1):
+                for element in elements:
+                    players.append((i, element))
+            player_counts = len(players)
+            # 按kind合并查询所有玩家的天梯数据，结果按队伍顺序取回
+            win_rates = self.leaderboard.resolve(kind, [element['profile_id'] for i, element in players], deadline)
+            for i, element in players:
+                player = str(element['name'])
+                if element['rating']:
+                    player_mmr = element['rating']
+                else:
+                    player_mmr = '--'
+                civilization = element['civilization']
+                player_profile_id = element['profile_id']
+                win_rate = win_rates[str(player_profile_id)]
+                values = (game_id, player, str(win_rate), civilization, map_chinese, str(player_profile_id), str(player_mmr), str(i), kind)
+                insert_sql = ("INSERT INTO last_game ( game_id, player, win_rate, civilization, map, profile_id, player_mmr, team, kind ) "
+                              "VALUES ( ?, ?, ?, ?, ?, ?, ?, ?, ? )")
+                game_data_list.append((insert_sql, values))
+                player_data_list.append((str(player), civilization, str(player_profile_id), str(player_mmr), str(win_rate), str(kind)))
+            # 数据校验，如果本次请求的数据缺失，终止
+            if last_game_kind in ('rm_1v1', 'qm_1v1') and player_counts != 2:
+                error = True
+            elif last_game_kind in ('rm_2v2', 'qm_2v2') and player_counts != 4:
+                error = True
+            elif last_game_kind in ('rm_3v3', 'qm_3v3') and player_counts != 6:
+                error = True
+            elif last_game_kind in ('rm_4v4', 'qm_4v4') and player_counts != 8:
+                error = True
+            if not error:
+                self.game_data_request_time += 1
+                print(f'{game_id}:第{self.game_data_request_time}次数据请求完成')
+                database_batch = []
+                if self.game_data_request_time == self.game_data_max_request_time:
+                    self.last_game_id = game_id
+                    # 写入数据库
+                    database_batch.extend(game_data_list)
+                # 重载gui界面
+                last_game_data = (map_chinese, str(game_id), len(player_data_list), player_data_list, kind)
+                self.gui_reload('reload game', last_game_data)
+                database_batch.append(("delete from last_game where game_id <> ?", (game_id,)))
+                # 整批写入队列，由写入线程在同一事务中提交
+                self.database_queue.put(database_batch)
+                return ongoing_state if self.last_game_id == game_id else scheduler.POLL_CONFIRMING
+            else:
+                print(f'game_id:{game_id}, 本次获取的数据不完整')
+                return scheduler.POLL_CONFIRMING
         except Exception as e:
             # 发生异常时，写入异常信息
             new_content = "\n" + time.strftime("%Y.%m.%d %H:%M:%S") + ": when request exception -- " + str(traceback.format_exc())
             print(new_content)
+            return scheduler.POLL_ERROR
             
-    def worker(self):
-        print('data thread start')
-        self.version_player_check()
-        while True:
-            if not self.quit_signal:
-                try:
-                    self.get_data()
-                except func_timeout.exceptions.FunctionTimedOut as e:
-                    new_content = "\n" + time.strftime("%Y.%m.%d %H:%M:%S") + ": when time sleep exception -- " + str(e)
-                    print(new_content)
-                if self.game_data_request_time == self.game_data_max_request_time:
-                    self.game_data_request_time = 0
-                time.sleep(10)
-            else:
-                break
+    def poll(self):
+        # 执行一次轮询（由调度器在后台线程中调用），返回本次轮询的状态
+        state = self.get_data()
+        if self.game_data_request_time == self.game_data_max_request_time:
+            self.game_data_request_time = 0
+        return state
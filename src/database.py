@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# Author: B_Snowflake
+# Date: 2026/10/18
+# LastEditTime: 2026/10/18
+
+import os
+import time
+import sqlite3
+
+# 用户数据库连接参数
+CACHE_SIZE_KB = 8192          # 页缓存大小（KB）
+MMAP_SIZE = 64 * 1024 * 1024  # 内存映射读取的最大字节数
+BUSY_TIMEOUT_MS = 5000        # 数据库被锁定时的等待时间（毫秒）
+
+
+def connect(database_path, readonly=False):
+    # 创建用户数据库连接：WAL模式下读写互不阻塞，写入线程与读取方各自使用独立连接
+    conn = sqlite3.connect(database_path, check_same_thread=False, timeout=BUSY_TIMEOUT_MS / 1000)
+    cur = conn.cursor()
+    cur.execute('PRAGMA journal_mode=WAL')
+    cur.execute('PRAGMA synchronous=NORMAL')
+    cur.execute(f'PRAGMA cache_size=-{CACHE_SIZE_KB}')
+    cur.execute(f'PRAGMA mmap_size={MMAP_SIZE}')
+    cur.execute(f'PRAGMA busy_timeout={BUSY_TIMEOUT_MS}')
+    cur.execute('PRAGMA temp_store=MEMORY')
+    if readonly:
+        cur.execute('PRAGMA query_only=ON')
+    return conn, cur
+
+
+def is_corrupt(error):
+    # 判断异常是否为数据库文件损坏或不是数据库文件（Python 3.11+ 提供sqlite_errorname，旧版本按错误信息判断）
+    error_name = getattr(error, 'sqlite_errorname', None)
+    if error_name is not None:
+        return error_name in ('SQLITE_CORRUPT', 'SQLITE_NOTADB')
+    message = str(error).lower()
+    return 'malformed' in message or 'not a database' in message
+
+
+def remove_database(database_path):
+    # 删除数据库文件以及WAL模式下的-wal、-shm文件
+    for suffix in ('', '-wal', '-shm'):
+        try:
+            os.remove(f'{database_path}{suffix}')
+        except FileNotFoundError:
+            pass
+
+
+def ensure_columns(cur, table, columns):
+    # 为已存在的旧表补齐缺失的列（columns: [(列名, 类型定义)]）
+    existing = {row[1] for row in cur.execute(f'PRAGMA table_info({table})').fetchall()}
+    for name, definition in columns:
+        if name not in existing:
+            cur.execute(f'ALTER TABLE {table} ADD COLUMN {name} {definition}')
+
+
+def migration_baseline(cur):
+    # v1.2.1 的表结构；旧版本数据库缺少的表和列在原表上补齐，保留已有数据
+    cur.execute(
+        'create table if not exists last_game (game_id INTEGER NOT NULL, player TEXT, win_rate TEXT, civilization TEXT, map TEXT, profile_id INTEGER,'
+        'player_mmr TEXT, team TEXT, kind Text, PRIMARY KEY (game_id,player))')
+    ensure_columns(cur, 'last_game', [('win_rate', 'TEXT'), ('civilization', 'TEXT'), ('map', 'TEXT'), ('profile_id', 'INTEGER'),
+                                      ('player_mmr', 'TEXT'), ('team', 'TEXT'), ('kind', 'TEXT')])
+    cur.execute('create table if not exists version (name TEXT NOT NULL,version TEXT, PRIMARY KEY (name))')
+    cur.execute('create table if not exists player_mark (profile_id text NOT NULL, flag INTEGER, reason TEXT, create_time INTEGER, backup1 TEXT, backup2 TEXT, backup3 TEXT, PRIMARY KEY (profile_id))')
+    ensure_columns(cur, 'player_mark', [('flag', 'INTEGER'), ('reason', 'TEXT'), ('create_time', 'INTEGER'),
+                                        ('backup1', 'TEXT'), ('backup2', 'TEXT'), ('backup3', 'TEXT')])
+
+
+def migration_game_history(cur):
+    # 本地对局历史，按账户增量同步
+    cur.execute('create table if not exists games (game_id INTEGER NOT NULL, map TEXT, kind TEXT, started_at TEXT, PRIMARY KEY (game_id))')
+    cur.execute('create table if not exists game_players (game_id INTEGER NOT NULL, profile_id TEXT NOT NULL, name TEXT, civilization TEXT, rating INTEGER, '
+                'rating_diff INTEGER, result TEXT, team INTEGER, seat INTEGER, PRIMARY KEY (game_id, profile_id))')
+    cur.execute('create index if not exists idx_game_players_profile_id on game_players (profile_id, game_id)')
+    cur.execute('create table if not exists game_history_sync (profile_id TEXT NOT NULL, newest_game_id INTEGER, oldest_game_id INTEGER, PRIMARY KEY (profile_id))')
+
+
+def migration_last_game_index(cur):
+    # 启动时按 team, player 顺序读取上一局数据
+    cur.execute('create index if not exists idx_last_game_team_player on last_game (team, player)')
+
+
+def migration_player_search_cache(cur):
+    # 玩家搜索结果缓存，players为json格式的玩家列表，complete表示结果是否包含该搜索词的全部匹配
+    cur.execute('create table if not exists player_search (query TEXT NOT NULL, players TEXT, complete INTEGER, create_time INTEGER, PRIMARY KEY (query))')
+
+
+# 数据库迁移步骤：(版本号, 名称, 升级函数)，按版本号顺序执行，只能追加，不能修改已发布的步骤
+MIGRATIONS = [
+    (1, 'baseline', migration_baseline),
+    (2, 'game_history', migration_game_history),
+    (3, 'last_game_index', migration_last_game_index),
+    (4, 'player_search_cache', migration_player_search_cache),
+]
+
+
+def migrate(conn, database_version):
+    # 在同一个事务中执行所有未执行的迁移步骤，并记录到schema_migrations表
+    cur = conn.cursor()
+    cur.execute('BEGIN IMMEDIATE')
+    try:
+        cur.execute('create table if not exists schema_migrations (version INTEGER NOT NULL, name TEXT, applied_time INTEGER, PRIMARY KEY (version))')
+        applied = {row[0] for row in cur.execute('select version from schema_migrations').fetchall()}
+        for version, name, upgrade in MIGRATIONS:
+            if version in applied:
+                continue
+            upgrade(cur)
+            cur.execute('insert into schema_migrations (version, name, applied_time) values (?, ?, ?)', (version, name, int(time.time())))
+            print(f'database migration applied: {version} {name}')
+        cur.execute('insert into version (name, version) values (?, ?) on conflict(name) do update set version = excluded.version',
+                    ('database', database_version))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
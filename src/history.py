@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# Author: B_Snowflake
+# Date: 2026/10/18
+# LastEditTime: 2026/10/18
+
+from collections import namedtuple
+from . import database
+from . import leaderboard
+
+GameRecord = namedtuple('GameRecord', ['game_id', 'map', 'kind', 'started_at', 'ongoing', 'players'])
+# players: [(profile_id, name, civilization, rating, rating_diff, result, team, seat)]
+
+
+def parse_game(game):
+    # 将 /players/{id}/games 接口返回的单局数据转换为GameRecord
+    players = []
+    for team_index, team in enumerate(game['teams'], 1):
+        for seat, player in enumerate(team, 1):
+            player = player['player']
+            players.append((str(player['profile_id']), player['name'], player['civilization'], player.get('rating'),
+                            player.get('rating_diff'), player.get('result'), team_index, seat))
+    return GameRecord(game['game_id'], game['map'], game['kind'], game.get('started_at'), bool(game.get('ongoing')), players)
+
+
+def history_data(record, profile_id):
+    # 将GameRecord转换为对局历史界面使用的数据格式
+    player_data = []
+    rating_diff = None
+    result = None
+    for player_profile_id, name, civilization, rating, player_rating_diff, player_result, team, seat in record.players:
+        player_mmr = str(rating) if rating else '--'
+        cached = leaderboard.get_cached(leaderboard.leaderboard_kind(record.kind), player_profile_id)
+        win_rate = str(cached['win_rate']) if cached else '0%'
+        if player_profile_id == profile_id:
+            rating_diff = player_rating_diff
+            result = player_result
+        player_data.append((name, civilization, player_profile_id, player_mmr, win_rate, record.kind))
+    return record.map, record.game_id, len(player_data), player_data, record.kind, rating_diff, result, profile_id
+
+
+class GameHistoryStore:
+    # 本地对局历史：读取使用独立的只读连接，写入整批交给数据库写入线程
+    # game_history_sync 记录每个账户在本地已连续同步的对局区间 [oldest_game_id, newest_game_id]
+    def __init__(self, database_path, database_queue):
+        self.database_path = database_path
+        self.database_queue = database_queue
+
+    def sync_range(self, profile_id):
+        conn, cur = database.connect(self.database_path, readonly=True)
+        try:
+            return self.read_sync_range(cur, profile_id)
+        finally:
+            conn.close()
+
+    def sync_state(self, profile_id):
+        # 返回 (newest_game_id, oldest_game_id, 区间内对局数量)，在同一个连接中读取
+        conn, cur = database.connect(self.database_path, readonly=True)
+        try:
+            newest, oldest = self.read_sync_range(cur, profile_id)
+            return newest, oldest, self.read_count(cur, profile_id, newest, oldest)
+        finally:
+            conn.close()
+
+    def count(self, profile_id):
+        # 已同步区间内该账户的对局数量
+        return self.sync_state(profile_id)[2]
+
+    def load(self, profile_id, limit, before_game_id=None):
+        # 按game_id倒序读取已同步区间内的对局，同步区间与对局在同一个连接中读取
+        conn, cur = database.connect(self.database_path, readonly=True)
+        try:
+            newest, oldest = self.read_sync_range(cur, profile_id)
+            if newest is None:
+                return []
+            upper = newest if before_game_id is None else min(newest, before_game_id - 1)
+            rows = cur.execute(
+                'select g.game_id, g.map, g.kind, g.started_at, p.profile_id, p.name, p.civilization, p.rating, p.rating_diff, p.result, p.team, p.seat '
+                'from games g join game_players p on p.game_id = g.game_id '
+                'where g.game_id in (select game_id from game_players where profile_id = ? and game_id between ? and ? order by game_id desc limit ?) '
+                'order by g.game_id desc, p.team, p.seat', (profile_id, oldest, upper, limit)).fetchall()
+        finally:
+            conn.close()
+        records = []
+        for game_id, map_name, kind, started_at, *player in rows:
+            if not records or records[-1].game_id != game_id:
+                records.append(GameRecord(game_id, map_name, kind, started_at, False, []))
+            records[-1].players.append(tuple(player))
+        return records
+
+    @staticmethod
+    def read_sync_range(cur, profile_id):
+        row = cur.execute('select newest_game_id, oldest_game_id from game_history_sync where profile_id = ?', (profile_id,)).fetchone()
+        return row if row else (None, None)
+
+    @staticmethod
+    def read_count(cur, profile_id, newest, oldest):
+        if newest is None:
+            return 0
+        return cur.execute('select count(*) from game_players where profile_id = ? and game_id between ? and ?',
+                           (profile_id, oldest, newest)).fetchone()[0]
+
+    def save(self, profile_id, records, newest_game_id, oldest_game_id):
+        # 保存已结束的对局，并更新该账户的同步区间，整批放入写入队列在同一事务中提交
+        game_sql = 'INSERT OR REPLACE INTO games (game_id, map, kind, started_at) VALUES (?, ?, ?, ?)'
+        player_sql = ('INSERT OR REPLACE INTO game_players (game_id, profile_id, name, civilization, rating, rating_diff, result, team, seat) '
+                      'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)')
+        batch = [(game_sql, (record.game_id, record.map, record.kind, record.started_at)) for record in records]
+        batch.extend((player_sql, (record.game_id, *player)) for record in records for player in record.players)
+        if newest_game_id is not None:
+            batch.append(('INSERT OR REPLACE INTO game_history_sync (profile_id, newest_game_id, oldest_game_id) VALUES (?, ?, ?)',
+                          (profile_id, newest_game_id, oldest_game_id)))
+        if batch:
+            self.database_queue.put(batch)
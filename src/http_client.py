@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# Author: B_Snowflake
+# Date: 2026/10/18
+# LastEditTime: 2026/10/18
+
+import time
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    pass
+
+
+class Deadline:
+    # 单次请求周期的截止时间，向下传递给每个HTTP请求，用于约束连接/读取超时和重试
+    def __init__(self, seconds):
+        self.expire_time = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expire_time - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+
+class HttpClient:
+    # 全局共享的HTTP客户端：复用keep-alive连接池，避免每次请求都重新进行TCP+TLS握手
+    def __init__(self, pool_connections=4, pool_maxsize=8, connect_timeout=5, read_timeout=15):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.session = requests.Session()
+        # pool_connections：缓存的host连接池数量；pool_maxsize：单个host保留复用的连接数
+        # 连接全部占用时不阻塞等待（requests不会把等待超时传给连接池，等待不受截止时间约束），而是临时新建连接，用完后丢弃
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=False)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def set_timeout(self, connect_timeout=None, read_timeout=None):
+        if connect_timeout is not None:
+            self.connect_timeout = connect_timeout
+        if read_timeout is not None:
+            self.read_timeout = read_timeout
+
+    def get(self, url, timeout=None, deadline=None, **kwargs):
+        if timeout is None:
+            timeout = (self.connect_timeout, self.read_timeout)
+        if deadline is not None:
+            # 超时不超过截止时间的剩余预算
+            remaining = deadline.remaining()
+            if remaining <= 0:
+                raise DeadlineExceeded(f'deadline exceeded before request: {url}')
+            timeout = (min(timeout[0], remaining), min(timeout[1], remaining))
+        return self.session.get(url, timeout=timeout, **kwargs)
+
+    def get_with_retry(self, url, deadline=None, max_attempts=3, backoff=0.5, **kwargs):
+        # 网络异常时重试，重试等待与请求本身都不会超出截止时间
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return self.get(url, deadline=deadline, **kwargs)
+            except DeadlineExceeded:
+                raise
+            except requests.exceptions.RequestException:
+                wait = backoff * 2 ** (attempt - 1)
+                if attempt >= max_attempts or (deadline is not None and deadline.remaining() <= wait):
+                    raise
+                time.sleep(wait)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    # 获取共享的HTTP客户端（首次调用时创建）
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
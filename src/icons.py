@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# Author: B_Snowflake
+# Date: 2026/10/18
+# LastEditTime: 2026/10/18
+
+import threading
+from functools import lru_cache
+from PySide6.QtGui import QPixmap, QPixmapCache
+
+
+class IconRepository:
+    # 图标资源库：保持资源数据库(data.pck)连接，图标数据在首次使用时才读取，最近使用的图标保存在有界缓存中
+    def __init__(self, conn, cache_size=128, pixmap_cache_kb=16384):
+        self.conn = conn
+        self.lock = threading.Lock()
+        # 地图中英文对照表只有文本，启动时一次性读取
+        self.map_names = {english_name: chinese_name for english_name, chinese_name in
+                          self.conn.execute('select english_name, chinese_name from t_map').fetchall()}
+        self.load_blob = lru_cache(maxsize=cache_size)(self.load_blob)
+        # 解码并缩放后的图标由QPixmapCache统一缓存，超出上限时按最近最少使用淘汰
+        QPixmapCache.setCacheLimit(pixmap_cache_kb)
+
+    def load_blob(self, asset, name):
+        with self.lock:
+            if asset == 'civilization':
+                row = self.conn.execute('select data from t_icon where type = ? and name = ?', ('civilization', name)).fetchone()
+            elif asset == 'rank':
+                row = self.conn.execute('select data from t_icon where type in (?,?) and name = ?', ('rank', 'team_rank', name)).fetchone()
+            elif asset == 'map':
+                row = self.conn.execute('select icon from t_map where english_name = ?', (name,)).fetchone()
+            elif asset == 'app_icon':
+                row = self.conn.execute('select data from t_icon where type = ?', ('app_icon',)).fetchone()
+            else:
+                raise ValueError(f'unknown asset: {asset}')
+        return row[0] if row and row[0] else b''
+
+    def pixmap(self, asset, name, width, height):
+        # 返回缩放到指定尺寸的图标，键为 (asset, name, 尺寸)，所有窗口共享；只能在GUI线程中调用
+        key = f'{asset}/{name}/{width}x{height}'
+        pixmap = QPixmapCache.find(key)
+        if pixmap is None or pixmap.isNull():
+            pixmap = QPixmap()
+            pixmap.loadFromData(self.load_blob(asset, name))
+            if pixmap.isNull():
+                return pixmap
+            pixmap = pixmap.scaled(width, height)
+            QPixmapCache.insert(key, pixmap)
+        return pixmap
+
+    def civilization(self, name):
+        return self.load_blob('civilization', name)
+
+    def rank(self, name):
+        return self.load_blob('rank', name)
+
+    def map_icon(self, english_name):
+        return self.load_blob('map', english_name)
+
+    def map_name(self, english_name):
+        return self.map_names.get(english_name, english_name)
+
+    def app_icon(self):
+        return self.load_blob('app_icon', None)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
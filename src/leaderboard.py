@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# Author: B_Snowflake
+# Date: 2026/10/18
+# LastEditTime: 2026/10/18
+
+import json
+from . import cache
+
+# 玩家天梯数据缓存，键为 (kind, profile_id)，值为 {'rating': ..., 'win_rate': ...}
+# 对局中玩家的分数和胜率不会变化，同一局的二次校验请求可直接命中缓存
+player_cache = cache.TTLCache(maxsize=512, ttl=600)
+
+
+def leaderboard_kind(game_kind):
+    # 根据对局类型返回对应的天梯类型
+    if game_kind == 'rm_1v1':
+        return 'rm_solo'
+    elif game_kind in ('rm_2v2', 'rm_3v3', 'rm_4v4'):
+        return 'rm_team'
+    elif game_kind == 'qm_ffa_nomad':
+        return 'qm_ffa'
+    return game_kind
+
+
+def get_cached(kind, profile_id):
+    return player_cache.get((kind, str(profile_id)))
+
+
+def put_cached(kind, profile_id, rating, win_rate):
+    player_cache.put((kind, str(profile_id)), {'rating': rating, 'win_rate': win_rate})
+
+
+class LeaderboardBatcher:
+    # 按游戏类型(kind)对一局游戏内所有玩家的天梯查询进行合并，尽量用最少的请求取回胜率
+    # 接口未文档化多id查询：一旦批量查询成功返回却缺少玩家，之后不再尝试批量查询，直接并发单个查询
+    leaderboard_url = 'https://aoe4world.com/api/v0/leaderboards/{}?profile_id={}'
+
+    def __init__(self, get_response, executor):
+        self.get_response = get_response
+        self.executor = executor
+        self.batch_enabled = True
+
+    def resolve(self, kind, profile_ids, deadline=None):
+        # 返回 {profile_id: win_rate}，未上榜的玩家为 '--'
+        profile_ids = [str(profile_id) for profile_id in dict.fromkeys(profile_ids)]
+        result = {}
+        missing = []
+        for profile_id in profile_ids:
+            cached = get_cached(kind, profile_id)
+            if cached is None:
+                missing.append(profile_id)
+            else:
+                result[profile_id] = cached['win_rate']
+        if self.batch_enabled and len(missing) > 1 and self.fetch_batch(kind, missing, deadline):
+            # 批量查询只缓存实际返回的玩家，未返回的玩家不能视为未上榜，仍逐个查询
+            still_missing = []
+            for profile_id in missing:
+                cached = get_cached(kind, profile_id)
+                if cached is None:
+                    still_missing.append(profile_id)
+                else:
+                    result[profile_id] = cached['win_rate']
+            if still_missing:
+                # 批量查询没有返回全部玩家，再次批量查询只会在单个查询前多一次串行请求
+                self.batch_enabled = False
+            missing = still_missing
+        # 接口不支持多id查询（或只有一名玩家）时，回退为并发的单个查询
+        futures = [(profile_id, self.executor.submit(self.fetch_one, kind, profile_id, deadline)) for profile_id in missing]
+        for profile_id, future in futures:
+            result[profile_id] = future.result(timeout=deadline.remaining() if deadline else None)
+        return result
+
+    def fetch_batch(self, kind, profile_ids, deadline=None):
+        # 用一次请求查询多个profile_id，请求成功时返回True，返回的玩家写入缓存
+        try:
+            response = self.get_response(self.leaderboard_url.format(kind, ','.join(profile_ids)), deadline=deadline)
+            if response is None or response.status_code != 200:
+                # 限流或服务端错误时不缓存，回退为单个查询
+                return False
+            players = json.loads(response.content.decode()).get('players') or []
+        except Exception as e:
+            print(f'error when batch request leaderboard: {e}')
+            return False
+        wanted = set(profile_ids)
+        for player in players:
+            profile_id = str(player.get('profile_id'))
+            if profile_id in wanted:
+                put_cached(kind, profile_id, player.get('rating'), player['win_rate'])
+        return True
+
+    def fetch_one(self, kind, profile_id, deadline=None):
+        response = self.get_response(self.leaderboard_url.format(kind, profile_id), deadline=deadline)
+        if response is None or response.status_code != 200:
+            # 只缓存成功的查询结果，失败时抛出异常，由本次轮询按请求异常处理并在下次轮询重试
+            raise IOError(f'leaderboard request failed: {kind} {profile_id} {getattr(response, "status_code", None)}')
+        players = json.loads(response.content.decode()).get('players')
+        if players:
+            put_cached(kind, profile_id, players[0].get('rating'), players[0]['win_rate'])
+            return players[0]['win_rate']
+        put_cached(kind, profile_id, None, '--')
+        return '--'
@@ -4,20 +4,25 @@
 
 import re
 import time
-import pytz
+import bisect
 import json
 import urllib3
-import requests
 import threading
+import urllib.parse
 from babel import Locale
-from rapidfuzz import fuzz
-from datetime import datetime
+from rapidfuzz import fuzz, process
 from retrying import retry
 from PySide6.QtGui import *
 from PySide6.QtCore import *
 from PySide6.QtWidgets import *
 from PySide6.QtSvg import QSvgRenderer
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from .. import http_client
+from .. import leaderboard
+from .. import history
+from .. import rank
+from .. import timeutil
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
@@ -74,22 +79,28 @@ class MenuPage(QStackedWidget):
     detail_signal = Signal(dict)
     apply_signal = Signal(tuple)
     add_new_game_history_signal = Signal(list)
+    more_game_history_signal = Signal(tuple)
+    player_mark_reload_signal = Signal(dict)
     
     def __init__(self, add_new_account_signal, settings_changed_signal, max_show_game_history, max_accounts,
-                 picked_profile_id, civilization_icon_dic, map_dic, rank_icon_dic, database_queue, player_mark_dic, *args, **kwargs):
+                 picked_profile_id, icons, database_queue, player_mark_dic, game_store, search_cache, search_debounce_ms=300, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.home_page = QWidget(self)
         self.new_page = QWidget(self)
         self.applied_player_info = None
-        self.civilization_icon_dic = civilization_icon_dic
+        self.icons = icons
         self.player_mark_dic = player_mark_dic
-        self.rank_icon_dic = rank_icon_dic
         self.max_accounts = max_accounts
         self.picked_profile_id = picked_profile_id
         self.settings_changed_signal = settings_changed_signal
-        self.map_dic = map_dic
         self.database_queue = database_queue
         self.max_show_game_history = max_show_game_history
+        self.search_cache = search_cache
+        self.search_debounce_ms = search_debounce_ms
+        # 向下滚动时分页加载更早的对局，game_history_limit为当前账户已展开的对局数量
+        self.game_history_limit = max_show_game_history
+        self.game_history_loading = False
+        self.game_history_exhausted = False
         self.added_player_info = None
         self.player_account_widget_reload_toolbutton_angle = 0
         self.data_loader_timer = QTimer(parent=self, interval=20)
@@ -100,12 +111,14 @@ class MenuPage(QStackedWidget):
         self.set_home_page()
         self.set_new_page()
         self.set_mark_widget()
-        self.search_player_details = PlayerDetail(self.detail_signal, self.add_new_game_history_signal, self.max_show_game_history)
+        self.search_player_details = PlayerDetail(self.detail_signal, self.add_new_game_history_signal, self.max_show_game_history, game_store,
+                                                  self.more_game_history_signal)
         self.add_new_game_history_signal.connect(self.add_new_game_history)
+        self.more_game_history_signal.connect(self.append_game_history)
+        self.player_mark_reload_signal.connect(self.reload_player_marks)
         self.detail_signal.connect(self.reload_player_details)
         self.apply_signal.connect(self.apply_player_details)
         self.add_new_account_signal = add_new_account_signal
-        self.game_history_widgets_collection = {}
     
     def apply_player_details(self, player_info):
         profile_id, profile_name = player_info
@@ -113,8 +126,11 @@ class MenuPage(QStackedWidget):
         self.search_player_details.get_detail(profile_id)
 
     def set_max_show_game_history(self, num):
+        # 调大时保留已经向下加载的对局，调小时只保留最新的num局
+        self.game_history_limit = max(num, self.game_history_limit) if num >= self.max_show_game_history else num
         self.max_show_game_history = num
         self.search_player_details.set_max_game_history(num)
+        self.player_game_history_model.trim(self.game_history_limit)
 
     def set_mark_widget(self):
         self.mark_widget = QWidget(parent=self.new_page, ObjectName="mark_widget")
@@ -167,10 +183,18 @@ class MenuPage(QStackedWidget):
         else:
             self.player_detail_icon_widget_player_mark_combobox.hide()
             self.player_detail_icon_widget_player_mark_label.hide()
-        for game_history_widget in self.game_history_widgets_collection.values():
-            for profile_id, player_widgets in game_history_widget.widgets_collection.items():
-                if profile_id == mark_profile_id:
-                    game_history_widget.set_player_mark(mark_profile_id, flag, reason)
+        self.refresh_game_history()
+
+    def reload_player_marks(self, player_marks):
+        # 玩家标记在后台加载完成后合并（不覆盖界面上已设置的标记），并刷新已显示的对局历史
+        for profile_id, mark in player_marks.items():
+            self.player_mark_dic.setdefault(profile_id, mark)
+        self.refresh_game_history()
+
+    def refresh_game_history(self):
+        # 卡片绘制时从player_mark_dic读取玩家标记，丢弃渲染缓存后重绘可见行即可
+        self.player_game_history_delegate.invalidate()
+        self.player_game_history_listview.viewport().update()
 
     def mark_player(self, data):
         profile_id, flag, reason = data
@@ -324,29 +348,36 @@ class MenuPage(QStackedWidget):
     def add_new_game_history(self, data_list):
         self.player_account_widget_combobox.setEnabled(True)
         self.player_account_widget_reload_toolbutton.setEnabled(True)
-        for data in data_list:
-            if data[1] in self.game_history_widgets_collection.keys():
-                self.game_history_widgets_collection[data[1]].deleteLater()
-            game_history_widgets = GameHistoryWidget(self.civilization_icon_dic, self.map_dic, self.rank_icon_dic, data, self.apply_signal, self.player_mark_dic, parent=self.player_game_history_widget)
-            game_id = game_history_widgets.game_id
-            self.game_history_widgets_collection[game_id] = game_history_widgets
-            self.player_game_history_widget_layout.addWidget(game_history_widgets)
-        self.sort_game_history_widgets()
+        # 本地数据与新增对局合并后，只保留最新的max_show_game_history局
+        if self.player_game_history_model.add_games(data_list, self.game_history_limit):
+            self.player_game_history_delegate.invalidate()
         self.data_loader_timer.stop()
-            
-    def sort_game_history_widgets(self):
-        # 1. 取排序后的 key
-        game_history_list = sorted((int(k) for k in self.game_history_widgets_collection.keys()), reverse=True)
-        # 2. 暂存 widget
-        widgets = [self.game_history_widgets_collection[i] for i in game_history_list]
-        # 3. 清空 layout（关键）
-        while self.player_game_history_widget_layout.count():
-            item = self.player_game_history_widget_layout.takeAt(0)
-            if item.widget():
-                item.widget().setParent(None)
-        # 4. 按顺序重新加入
-        for w in widgets:
-            self.player_game_history_widget_layout.addWidget(w)
+
+    def on_game_history_scrolled(self, value):
+        # 滚动到距底部不足两张卡片时，在后台加载下一页更早的对局
+        scrollbar = self.player_game_history_listview.verticalScrollBar()
+        if value < scrollbar.maximum() - 300 or self.game_history_loading or self.game_history_exhausted:
+            return
+        games = self.player_game_history_model.games
+        if not games:
+            return
+        self.game_history_loading = True
+        self.search_player_details.get_more_game_history(self.player_account_widget_combobox.currentData(), games[-1][1])
+
+    def append_game_history(self, result):
+        profile_id, data_list = result
+        if profile_id != self.player_account_widget_combobox.currentData():
+            # 账户已切换，丢弃旧账户的分页结果
+            return
+        self.game_history_loading = False
+        if data_list is None:
+            # 加载失败（如网络错误），下次滚动到底部时重试
+            return
+        if not data_list:
+            self.game_history_exhausted = True
+            return
+        self.game_history_limit += len(data_list)
+        self.player_game_history_model.add_games(data_list, self.game_history_limit)
 
     def set_by_data(self, target, combo=None):
         if combo is None:
@@ -398,22 +429,26 @@ class MenuPage(QStackedWidget):
         self.player_account_widget_account_layout.addWidget(self.player_account_widget_reload_toolbutton, alignment=Qt.AlignmentFlag.AlignLeft)
         self.player_account_widget_account_layout.addStretch(1)
         
-        self.player_game_history_widget_scrollarea = QScrollArea(self.home_page)
-        self.player_game_history_widget_scrollarea.setViewportMargins(0, 0, 0, 0)
-        self.player_game_history_widget = QWidget(self.home_page)
-   
-        self.player_game_history_widget_scrollarea.setWidgetResizable(True)
-        self.player_game_history_widget_scrollarea.setFrameShape(QFrame.Shape.NoFrame)
-        self.player_game_history_widget_layout = QVBoxLayout(self.player_game_history_widget) 
-        self.player_game_history_widget_layout.setContentsMargins(0, 0, 0, 0)
-        self.player_game_history_widget_layout.setSpacing(30)
-        self.player_game_history_widget_scrollarea.setWidget(self.player_game_history_widget)
+        # 对局历史使用模型/视图，只绘制可见的行，显示数量增加时几乎不占用额外的控件和内存
+        self.player_game_history_model = GameHistoryModel(parent=self)
+        self.player_game_history_listview = QListView(self.home_page)
+        self.player_game_history_listview.setModel(self.player_game_history_model)
+        self.player_game_history_delegate = GameHistoryDelegate(self.icons, self.apply_signal, self.player_mark_dic, parent=self.player_game_history_listview)
+        self.player_game_history_listview.setItemDelegate(self.player_game_history_delegate)
+        self.player_game_history_listview.setUniformItemSizes(True)
+        self.player_game_history_listview.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.player_game_history_listview.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
+        self.player_game_history_listview.setFocusPolicy(Qt.FocusPolicy.NoFocus)
+        self.player_game_history_listview.setFrameShape(QFrame.Shape.NoFrame)
+        self.player_game_history_listview.setMouseTracking(True)
+        self.player_game_history_listview.setSpacing(15)
+        self.player_game_history_listview.verticalScrollBar().valueChanged.connect(self.on_game_history_scrolled)
         
         self.player_account_widget_layout.addWidget(self.player_account_widget_combobox)
         
         self.home_page_layout.addWidget(self.player_account_widget_label)
         self.home_page_layout.addLayout(self.player_account_widget_account_layout)
-        self.home_page_layout.addWidget(self.player_game_history_widget_scrollarea)
+        self.home_page_layout.addWidget(self.player_game_history_listview)
 
     def on_player_account_widget_combobox_currentIndexChanged(self, index):
         if index != -1:
@@ -421,9 +456,12 @@ class MenuPage(QStackedWidget):
             self.data_loader_timer.start()
             self.player_account_widget_combobox.setEnabled(False)
             profile_id = self.player_account_widget_combobox.currentData()
-            for key, value in self.game_history_widgets_collection.items():
-                value.deleteLater()
-            self.game_history_widgets_collection.clear()
+            self.player_game_history_model.clear()
+            self.game_history_limit = self.max_show_game_history
+            self.game_history_loading = False
+            self.game_history_exhausted = False
+            # 同一局在不同账户下的高亮和胜负不同，切换账户时丢弃渲染缓存
+            self.player_game_history_delegate.invalidate()
             self.search_player_details.get_game_history(profile_id)
             self.settings_changed_signal.emit(('picked_profile_id', profile_id))
 
@@ -567,7 +605,8 @@ class MenuPage(QStackedWidget):
             self.player_detail_rank_matchmaking_widget_layout.addWidget(self.player_detail_rank_matchmaking_widget_table)
             
         self.new_page_layout = QVBoxLayout(self.new_page)
-        self.search_completer = SearchCompleter(parent=self.new_page, PlaceholderText="请输入玩家名称", apply_signal=self.apply_signal)
+        self.search_completer = SearchCompleter(parent=self.new_page, PlaceholderText="请输入玩家名称", apply_signal=self.apply_signal,
+                                                search_cache=self.search_cache, debounce_ms=self.search_debounce_ms)
         self.search_completer.setMinimumHeight(30)
         self.player_detail_widget = QWidget(self.new_page)
         self.add_new_account_button = QPushButton(parent=self.player_detail_widget, text="添加至我的账号")
@@ -623,9 +662,10 @@ class MenuPage(QStackedWidget):
         
 class SearchCompleter(QLineEdit):
     # 使用Listview和linedit编写的自定义搜索框，类似百度的效果
-    search_signal = Signal(str, list)
+    # search_signal: (搜索词, 结果列表, 是否检索失败)，检索失败时结果列表为空
+    search_signal = Signal(str, list, bool)
     
-    def __init__(self, parent=None, PlaceholderText=None, apply_signal=None):
+    def __init__(self, parent=None, PlaceholderText=None, apply_signal=None, search_cache=None, debounce_ms=300):
         super().__init__(parent)
         self.focused_on = False
         self.setFrame(False)
@@ -641,7 +681,10 @@ class SearchCompleter(QLineEdit):
         # 连接信号
         self.suggestion_list.itemClicked.connect(self.apply_suggestion)
         self.search_signal.connect(self.set_suggestions_list)
-        self.search = PlayerSearch(self.search_signal)
+        self.search = PlayerSearch(self.search_signal, search_cache)
+        # 输入停顿debounce_ms毫秒后才发起搜索，连续输入只请求最后一次的内容
+        self.search_timer = QTimer(self, singleShot=True, interval=debounce_ms)
+        self.search_timer.timeout.connect(self.start_search)
         self.textChanged.connect(self.text_changed)
     
     def focusInEvent(self, event):
@@ -659,18 +702,26 @@ class SearchCompleter(QLineEdit):
     def text_changed(self, text):
         self.applyed = False
         if text:
-            self.search.search(text)
+            self.search_timer.start()
             self.query_rs = []
-            self.search_signal.emit(text, [])
+            self.search_signal.emit(text, [], False)
         else:
+            self.search_timer.stop()
+            self.search.cancel()
             self.suggestion_list.hide()
 
-    def set_suggestions_list(self, query, query_rs):
+    def start_search(self):
+        if text := self.text():
+            self.search.search(text)
+
+    def set_suggestions_list(self, query, query_rs, failed):
         if query and query == self.text():
-            if len(query_rs) == 0:
+            if failed:
+                self.suggestions = ["没有检索到相关ID"]
+            elif len(query_rs) == 0:
                 self.suggestions = ["正在检索，请稍候..."]
             else:
-                self.suggestions = [f"{str(item[1])}     最后游戏时间：{str(item[2])}" for item in query_rs]
+                self.suggestions = [f"{str(item[1])}     最后游戏时间：{timeutil.format_timestamp(item[2])}" for item in query_rs]
             self.query_rs = query_rs
             self.show_suggestions()
 
@@ -732,113 +783,205 @@ class SearchCompleter(QLineEdit):
         
         
 class PlayerSearch:
-    def __init__(self, search_signal):
+    # 玩家搜索：请求在有界线程池中执行；每次新的搜索递增generation，旧搜索在请求前后检查generation，过期则放弃，结果不再返回界面
+    def __init__(self, search_signal, search_cache=None):
         self.search_url = 'https://aoe4world.com/api/v0/players/search?query={}'
         self.search_signal = search_signal
+        self.search_cache = search_cache
+        self.client = http_client.get_client()
+        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='player_search')
+        self.generation = 0
+        self.timeout = 10  # 单次搜索的总超时时间（秒）
+
+    def cancel(self):
+        self.generation += 1
 
     def search(self, query):
-        def req(query):
+        def req(query, generation):
+            if generation != self.generation:
+                return
             try:
-                response = self.get_response(self.search_url.format(query))
-                data = json.loads(response.text)
-                result_list = self.sort_players(query, [(player['profile_id'], player['name'], self.timezone_convert(player['last_game_at'])) for player in data['players']])
+                players = self.search_cache.get(query) if self.search_cache else None
+                if players is None:
+                    players = self.fetch_players(query, generation)
+                    if players is None:
+                        return
+                result_list = self.sort_players(query, [(profile_id, name, timeutil.parse_timestamp(last_game_at)) for profile_id, name, last_game_at in players])
+                failed = not result_list
             except Exception as e:
-                result_list = ["没有检索到相关ID"]
+                result_list = []
+                failed = True
                 print('search error:', e)
-            self.search_signal.emit(query, result_list)
-        threading.Thread(target=req, args=(query,), daemon=True).start()
+            if generation == self.generation:
+                self.search_signal.emit(query, result_list, failed)
+        self.generation += 1
+        self.executor.submit(req, query, self.generation)
     
-    @retry(stop_max_attempt_number=10)
-    def get_response(self, url):
-        # 从API接口获取数据，最多重试10次
+    def fetch_players(self, query, generation):
+        # 请求接口并写入缓存；网络不可用时使用未超过最长保存时间的旧结果；搜索已过期时返回None
         try:
-            response = requests.get(url=url)
-            return response
-        except Exception as network_error:
-            print(network_error)
+            response = self.get_response(self.search_url.format(urllib.parse.quote(query)), http_client.Deadline(self.timeout))
+            if generation != self.generation:
+                return None
+            data = json.loads(response.text)
+        except Exception:
+            stale = self.search_cache.get(query, allow_stale=True) if self.search_cache else None
+            if stale is None:
+                raise
+            return stale
+        players = [(player['profile_id'], player['name'], player['last_game_at']) for player in data['players']]
+        if self.search_cache:
+            self.search_cache.put(query, players, complete='per_page' in data and len(players) < data['per_page'])
+        return players
+
+    def get_response(self, url, deadline=None):
+        # 从API接口获取数据，网络异常时在截止时间内重试
+        return self.client.get_with_retry(url, deadline=deadline, max_attempts=3)
             
     @staticmethod 
     def sort_players(query: str, players):
-        def sort_key(item):
-            _, name, last_game_at_str = item
-            last_game_at = datetime.strptime(last_game_at_str, "%Y-%m-%d %H:%M:%S")
-            name_l = name.lower()
-            # fuzz 相似度（主排序，越大越靠前）
-            similarity = fuzz.ratio(q, name_l)
-            # 时间排序（次排序，越近越靠前）
-            # sorted 是升序，所以用负时间戳
-            time_score = last_game_at.timestamp() if last_game_at else float("inf")
-            return similarity, time_score
-
+        # players: [(profile_id, name, 最后游戏时间戳)]
+        # fuzz 相似度（主排序，越大越靠前）由rapidfuzz一次批量计算；时间戳（次排序，越近越靠前）保持为数字直接比较
+        if not players:
+            return []
         q = query.lower().strip()
-        return sorted(players, key=sort_key, reverse=True)
-
-    @staticmethod
-    def timezone_convert(utc_time_str):
-        # 将UTC时间转换到北京时间
-        utc_dt = datetime.strptime(utc_time_str, "%Y-%m-%dT%H:%M:%S.%fZ")
-        utc_dt = utc_dt.replace(tzinfo=pytz.UTC)
-        beijing_tz = pytz.timezone("Asia/Shanghai")
-        beijing_dt = utc_dt.astimezone(beijing_tz)
-        return beijing_dt.strftime("%Y-%m-%d %H:%M:%S")
+        scores = process.extract(q, [name.lower() for _, name, _ in players], scorer=fuzz.ratio, limit=None)
+        ranked = sorted(((score, players[index][2] or 0, index) for _, score, index in scores), reverse=True)
+        return [players[index] for _, _, index in ranked]
     
     
 class PlayerDetail:
-    def __init__(self, detail_signal, add_new_game_history_signal, max_game_history):
+    def __init__(self, detail_signal, add_new_game_history_signal, max_game_history, game_store, more_game_history_signal):
         self.detail_url = 'https://aoe4world.com/api/v0/players/{}'
-        self.game_history_url = 'https://aoe4world.com/api/v0/players/{}/games'
+        self.game_history_url = 'https://aoe4world.com/api/v0/players/{}/games?page={}'
         self.locale = Locale.parse("zh")
         self.detail_signal = detail_signal
         self.max_game_history = max_game_history
+        self.max_sync_pages = 5  # 单次同步最多请求的页数
+        self.per_page = 50  # 接口每页对局数，以接口返回的per_page为准
+        self.more_page_size = 20  # 向下滚动时每次追加的对局数
+        self.game_store = game_store
         self.add_new_game_history_signal = add_new_game_history_signal
+        self.more_game_history_signal = more_game_history_signal
         self.country_cache = {}
+        self.client = http_client.get_client()
 
     def set_max_game_history(self, max_game_history):
         self.max_game_history = max_game_history
 
     def get_game_history(self, profile_id):
         def req(profile_id):
+            # 先从本地对局历史渲染，再只请求本地最新对局之后的新对局并合并
             data_list = []
             try:
-                response = self.get_response(self.game_history_url.format(profile_id))
-                response_data = json.loads(response.text)
-                index = 0
-                for game in response_data['games']:
-                    index = index + 1 
-                    if index > self.max_game_history:
-                        break
-                    player_data = []
-                    map_name = game['map']
-                    game_id = game['game_id']
-                    kind = game['kind']
-                    teams = game['teams']
-                    for team in teams:
-                        for player in team:
-                            player_profile_id = str(player['player']['profile_id'])
-                            player_name = player['player']['name']
-                            player_mmr = str(player['player']['rating']) if player['player']['rating'] else '--'
-                            civilization = player['player']['civilization']
-                            win_rate = '0%'
-                            kind = kind
-                            if player_profile_id == profile_id:
-                                rating_diff = player['player']['rating_diff']
-                                result = player['player']['result']
-                            player_data.append((player_name, civilization, player_profile_id, player_mmr, win_rate, kind))
-                    game_mode = len(player_data)
-                    data = (map_name, game_id, game_mode, player_data, kind, rating_diff, result, profile_id)
-                    data_list.append(data)
+                local_records = self.game_store.load(profile_id, self.max_game_history)
+                if local_records:
+                    self.add_new_game_history_signal.emit([history.history_data(record, profile_id) for record in local_records])
+                records = self.sync_game_history(profile_id, fill=len(local_records) < self.max_game_history)
+                data_list = [history.history_data(record, profile_id) for record in records[:self.max_game_history]]
             except Exception as e:
                 print('detail error:', e)
             finally:
                 self.add_new_game_history_signal.emit(data_list)
-                
+
         threading.Thread(target=req, args=(profile_id,), daemon=True).start()
-        
+
+    def get_more_game_history(self, profile_id, before_game_id):
+        def req(profile_id, before_game_id):
+            # 加载比before_game_id更早的对局：优先读取本地，不足时再向接口请求更早的页；加载失败时返回None
+            data_list = None
+            try:
+                records = self.game_store.load(profile_id, self.more_page_size, before_game_id)
+                if len(records) < self.more_page_size:
+                    records.extend(self.fetch_older_game_history(profile_id, before_game_id, {record.game_id for record in records},
+                                                                 self.more_page_size - len(records)))
+                data_list = [history.history_data(record, profile_id) for record in records[:self.more_page_size]]
+            except Exception as e:
+                print('game history error:', e)
+            finally:
+                self.more_game_history_signal.emit((profile_id, data_list))
+
+        threading.Thread(target=req, args=(profile_id, before_game_id), daemon=True).start()
+
+    def fetch_older_game_history(self, profile_id, before_game_id, seen, count):
+        # 页码由本地已同步的对局数量计算，从包含本地最旧对局的那一页开始请求，使新数据与本地区间首尾相接
+        newest, oldest, local_count = self.game_store.sync_state(profile_id)
+        page = (local_count - 1) // self.per_page + 1 if local_count else 1
+        overlapped = False
+        fetched = []
+        older = []
+        for _ in range(self.max_sync_pages):
+            response = self.get_response(self.game_history_url.format(profile_id, page))
+            response_data = json.loads(response.text)
+            self.per_page = response_data.get('per_page') or self.per_page
+            records = [history.parse_game(game) for game in response_data['games']]
+            if oldest is not None and any(record.game_id >= oldest for record in records):
+                overlapped = True
+            for record in records:
+                # 按game_id去重，新对局导致的分页偏移不会产生重复
+                if record.game_id in seen:
+                    continue
+                seen.add(record.game_id)
+                fetched.append(record)
+                if record.game_id < before_game_id:
+                    older.append(record)
+            if len(older) >= count or len(records) < self.per_page:
+                break
+            page += 1
+        finished = [record for record in fetched if not record.ongoing]
+        if finished:
+            finished_ids = [record.game_id for record in finished]
+            if newest is None:
+                self.game_store.save(profile_id, finished, max(finished_ids), min(finished_ids))
+            elif overlapped:
+                self.game_store.save(profile_id, finished, max(newest, max(finished_ids)), min(oldest, min(finished_ids)))
+            else:
+                # 与本地区间不相接时只保存对局，不扩展同步区间
+                self.game_store.save(profile_id, finished, None, None)
+        return older[:count]
+
+    def sync_game_history(self, profile_id, fill=False):
+        # 增量同步：按页请求，直到与本地已同步的最新对局重合；本地数据不足(fill)时从第一页重新同步补足
+        newest, oldest = (None, None) if fill else self.game_store.sync_range(profile_id)
+        fetched = []
+        overlapped = False
+        page = 1
+        while page <= self.max_sync_pages:
+            response = self.get_response(self.game_history_url.format(profile_id, page))
+            response_data = json.loads(response.text)
+            records = [history.parse_game(game) for game in response_data['games']]
+            new_records = [record for record in records if newest is None or record.game_id > newest]
+            fetched.extend(new_records)
+            if len(new_records) < len(records):
+                overlapped = True
+                break
+            if len(records) < response_data.get('per_page', len(records)) or not records:
+                # 已到最后一页，区间完整
+                overlapped = True
+                break
+            if newest is None and len(fetched) >= self.max_game_history:
+                break
+            page += 1
+        # 进行中的对局结果未定，不写入本地
+        finished = [record for record in fetched if not record.ongoing]
+        if finished:
+            finished_ids = [record.game_id for record in finished]
+            if overlapped and newest is not None:
+                new_range = (max(newest, max(finished_ids)), oldest)
+            else:
+                new_range = (max(finished_ids), min(finished_ids))
+            self.game_store.save(profile_id, finished, *new_range)
+        return fetched
+
     def get_detail(self, profile_id):
         def req(profile_id):
             try:
                 response = self.get_response(self.detail_url.format(profile_id))
                 data = json.loads(response.text)
+                # 顺便刷新天梯数据缓存，供对局界面复用
+                for kind, mode in (data.get('modes') or {}).items():
+                    if isinstance(mode, dict) and 'win_rate' in mode:
+                        leaderboard.put_cached(kind, profile_id, mode.get('rating'), mode['win_rate'])
                 avatar_full_url = data['avatars']['full'] if data['avatars']['full'] else "https://avatars.akamai.steamstatic.com/fef49e7fa7e1997310d705b2a6158ff8dc1cdfeb_full.jpg"
                 if avatar_full_url:
                     avatar_full_img = self.get_response(avatar_full_url)
@@ -872,21 +1015,20 @@ class PlayerDetail:
     def get_response(self, url):
         # 从API接口获取数据，最多重试10次
         try:
-            response = requests.get(url=url, verify=False)
+            response = self.client.get(url=url, verify=False)
             return response
         except Exception as network_error:
             print(network_error)
             
             
 class GameHistoryWidget(QWidget):
+    # 对局历史卡片：控件在创建时一次性建好（左右两侧各slots_per_side个玩家位），通过bind()绑定新的对局数据后重复使用
+    slots_per_side = 4
 
-    def __init__(self, civilization_icon_dic, map_dic, rank_icon_dic, data, apply_signal, player_mark_dic, *args, **kwargs):
+    def __init__(self, icons, data, apply_signal, player_mark_dic, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.map_name, self.game_id, self.game_mode, self.player_data, self.kind, self.rating_diff, self.result, self.profile_id = data
-        self.civilization_icon_dic = civilization_icon_dic
-        self.rank_icon_dic = rank_icon_dic
+        self.icons = icons
         self.player_mark_dic = player_mark_dic
-        self.map_dic = map_dic
         self.apply_signal = apply_signal
         self.main_layout = QHBoxLayout(self)
         self.main_layout.setContentsMargins(0, 0, 0, 0)
@@ -895,7 +1037,6 @@ class GameHistoryWidget(QWidget):
         self.left_side_widget = QWidget(parent=self)
         self.mid_side_widget = QWidget(parent=self)
         self.right_side_widget = QWidget(parent=self)
-        self.set_mmr_rank_map()
         
         self.main_layout.addWidget(self.result_widget)
         self.main_layout.addWidget(self.left_side_widget)
@@ -932,10 +1073,16 @@ class GameHistoryWidget(QWidget):
         self.icon_size = QSize(80, 80)
         self.mid_side_widget_layout.setContentsMargins(0, 15, 0, 25)
         self.mid_side_widget.setFixedSize(110, 150)
-            
+        self.rank_icon_size = QSize(24, 37)
+        self.civ_icon_size = QSize(40, 24)
+        self.blank_rank_pixmap = QPixmap(self.rank_icon_size)
+        self.blank_rank_pixmap.fill(Qt.transparent)
+
         self.widgets_collection = {}
+        self.slots = {'left': [], 'right': []}
         self.set_mid_side_widget()
         self.set_left_and_right_side_widget()
+        self.bind(data)
 
     @staticmethod
     def islongname(string):
@@ -961,16 +1108,11 @@ class GameHistoryWidget(QWidget):
         self.apply_signal.emit(player_info)
         
     def set_mid_side_widget(self):
-        game_type = '(天梯)' if 'rm' in self.kind else ''
-        self.mid_side_widget_map_name_label = QLabel(parent=self.mid_side_widget, text=f'{self.map_dic.get(self.map_name)[0]}{game_type}')
-        self.widgets_collection['mid_side_map_name'] = self.mid_side_widget_map_name_label
+        self.mid_side_widget_map_name_label = QLabel(parent=self.mid_side_widget)
         self.mid_side_widget_layout.addWidget(self.mid_side_widget_map_name_label, alignment=Qt.AlignmentFlag.AlignCenter)
-        if self.icon_size:
-            self.mid_side_widget_map_icon_label = QLabel(parent=self.mid_side_widget)
-            self.mid_side_widget_map_icon_label.setFixedSize(self.icon_size)
-            self.widgets_collection['mid_side_map_icon'] = self.mid_side_widget_map_icon_label
-            self.mid_side_widget_map_icon_label.setPixmap(self.get_map_icon(self.map_name).scaled(self.icon_size))
-            self.mid_side_widget_layout.addWidget(self.mid_side_widget_map_icon_label, alignment=Qt.AlignmentFlag.AlignCenter)        
+        self.mid_side_widget_map_icon_label = QLabel(parent=self.mid_side_widget)
+        self.mid_side_widget_map_icon_label.setFixedSize(self.icon_size)
+        self.mid_side_widget_layout.addWidget(self.mid_side_widget_map_icon_label, alignment=Qt.AlignmentFlag.AlignCenter)
 
     def set_player_mark(self, profile_id, flag, reason):
         mark_combobox = self.widgets_collection[profile_id]['mark_combobox']
@@ -978,189 +1120,288 @@ class GameHistoryWidget(QWidget):
         mark_combobox.setToolTip(reason)
 
     def set_left_and_right_side_widget(self):
+        self.result_widget_layout = QHBoxLayout(self.result_widget)
+        self.result_widget_layout.setContentsMargins(0, 0, 0, 0)
+        self.result_widget_layout.setSpacing(5)
+        self.result_label = QLabel(parent=self.result_widget)
+        self.rating_diff_label = QLabel(parent=self.result_widget)
+        self.rating_diff_label.setFixedWidth(25)
+        self.result_widget_layout.addWidget(self.result_label, alignment=Qt.AlignmentFlag.AlignHCenter)
+        self.result_widget_layout.addWidget(self.rating_diff_label, alignment=Qt.AlignmentFlag.AlignHCenter)
 
-        def set_result_widget():
-            self.result_widget_layout = QHBoxLayout(self.result_widget)
-            self.result_widget_layout.setContentsMargins(0, 0, 0, 0)
-            self.result_widget_layout.setSpacing(5)
-            if self.result:
-                if self.result == 'win':
-                    style = "color: green"
-                    result_text = "↑"
-                else:
-                    style = "color: red"
-                    result_text = "↓"
-                if self.rating_diff:
-                    if self.rating_diff > 0:
-                        rating_diff_text = f'+{self.rating_diff}'
-                    elif self.rating_diff <= 0:
-                        rating_diff_text = f'{self.rating_diff}'
-                    else:
-                        rating_diff_text = '--'
-                else:
-                    rating_diff_text = '--'
-            else:
-                style = ""
-                result_text = " "
-                rating_diff_text = ' '
-            self.result_label = QLabel(parent=self.result_widget, text=result_text)
-            self.result_label.setStyleSheet(style)
-            self.rating_diff_label = QLabel(parent=self.result_widget, text=rating_diff_text)
-            self.rating_diff_label.setFixedWidth(25)
-            self.rating_diff_label.setStyleSheet(style)
-            
-            self.result_widget_layout.addWidget(self.result_label, alignment=Qt.AlignmentFlag.AlignHCenter)
-            self.result_widget_layout.addWidget(self.rating_diff_label, alignment=Qt.AlignmentFlag.AlignHCenter)
-
-        def create_contents(player, profile_id, civilization, player_mmr, side):
-            parent = self.left_side_widget if side == 'left' else self.right_side_widget
-            layout = QHBoxLayout()
-            layout.setContentsMargins(0, 0, 0, 0)
-            layout.setSpacing(5)
-            player_rank_icon_label = QLabel(parent=parent)
-            if 'rm' in self.kind:
-                pixmap = self.get_rank_icon(player_mmr).scaled(QSize(24, 37))
-            else:
-                pixmap = QPixmap(QSize(24, 37))
-                pixmap.fill(Qt.transparent)
-            player_rank_icon_label.setPixmap(pixmap)
-            player_name = self.islongname(player)
-            player_name_label = ClickableLabel(id=profile_id, name=player, parent=parent, text=player_name)
-            if player_name != player:
-                player_name_label.setToolTip(player)
-            else:
-                player_name_label.setToolTip('')
-            player_name_label.setStyleSheet("color: rgb(114, 137, 218)" if self.profile_id == profile_id else "")
-            player_name_label.clicked.connect(self.on_player_name_clicked)
-            player_civ_label = QLabel(parent=parent)
-            player_civ_label.setPixmap(self.get_civ_icon(civilization).scaled(40, 24))
-            player_mark_combobox = ReadOnlyComboBox(parent=parent, ObjectName="player_mark_combobox")
-            player_mark_combobox.profile_id = profile_id
-            player_mark_combobox.setFixedSize(22, 22)
-            player_mark_combobox.addItem(QIcon(":images/icons/noob.png"), '')
-            player_mark_combobox.addItem(QIcon(":images/icons/carry.png"), '')
-            player_mark_combobox.addItem(QIcon(":images/icons/hacker.png"), '')
-            if mark := self.player_mark_dic.get(profile_id):
-                player_mark_combobox.setCurrentIndex(mark[0])
-                player_mark_combobox.setToolTip(mark[1])
-            else:
-                player_mark_combobox.setCurrentIndex(-1)
-                player_mark_combobox.setToolTip('')
-            player_mmr_label = QLabel(parent=parent, text=player_mmr)
-            self.widgets_collection[profile_id] = {}
-            self.widgets_collection[profile_id]['name_label'] = player_name_label
-            self.widgets_collection[profile_id]['civ_label'] = player_civ_label
-            self.widgets_collection[profile_id]['mark_combobox'] = player_mark_combobox
-            self.widgets_collection[profile_id]['mmr_label'] = player_mmr_label
-            return layout, player_rank_icon_label, player_name_label, player_civ_label, player_mark_combobox, player_mmr_label
-            
-        def add_to_left_side(player, profile_id, civilization, player_mmr):
-            layout, player_rank_icon_label, player_name_label, player_civ_label, player_mark_combobox, player_mmr_label = (
-                create_contents(player, profile_id, civilization, player_mmr, 'left'))
+        self.right_side_widget_layout.addStretch(1)
+        self.left_side_widget_layout.addStretch(1)
+        for _ in range(self.slots_per_side):
+            self.add_slot('left')
+            self.add_slot('right')
+        self.right_side_widget_layout.addStretch(1)
+        self.left_side_widget_layout.addStretch(1)
+
+    def add_slot(self, side):
+        # 创建一个玩家位，未使用的玩家位整行隐藏
+        parent = self.left_side_widget if side == 'left' else self.right_side_widget
+        row_widget = QWidget(parent=parent)
+        layout = QHBoxLayout(row_widget)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(5)
+        player_rank_icon_label = QLabel(parent=row_widget)
+        player_name_label = ClickableLabel(id=None, name=None, parent=row_widget)
+        player_name_label.clicked.connect(self.on_player_name_clicked)
+        player_civ_label = QLabel(parent=row_widget)
+        player_mark_combobox = ReadOnlyComboBox(parent=row_widget, ObjectName="player_mark_combobox")
+        player_mark_combobox.setFixedSize(22, 22)
+        player_mark_combobox.addItem(QIcon(":images/icons/noob.png"), '')
+        player_mark_combobox.addItem(QIcon(":images/icons/carry.png"), '')
+        player_mark_combobox.addItem(QIcon(":images/icons/hacker.png"), '')
+        player_mmr_label = QLabel(parent=row_widget)
+        if side == 'left':
             layout.addWidget(player_rank_icon_label, alignment=Qt.AlignmentFlag.AlignCenter)
             layout.addWidget(player_civ_label, alignment=Qt.AlignmentFlag.AlignCenter)
             layout.addWidget(player_name_label, alignment=Qt.AlignmentFlag.AlignCenter)
             layout.addStretch(1)
             layout.addWidget(player_mark_combobox, alignment=Qt.AlignmentFlag.AlignCenter)
             layout.addWidget(player_mmr_label, alignment=Qt.AlignmentFlag.AlignCenter)
-            self.left_side_widget_layout.addLayout(layout)
-        
-        def add_to_right_side(player, profile_id, civilization, player_mmr):
-            layout, player_rank_icon_label, player_name_label, player_civ_label, player_mark_combobox, player_mmr_label = (
-                create_contents(player, profile_id, civilization, player_mmr, 'right'))
+        else:
             layout.addWidget(player_mmr_label, alignment=Qt.AlignmentFlag.AlignCenter)
             layout.addWidget(player_mark_combobox, alignment=Qt.AlignmentFlag.AlignCenter)
             layout.addStretch(1)
             layout.addWidget(player_name_label, alignment=Qt.AlignmentFlag.AlignCenter)
             layout.addWidget(player_civ_label, alignment=Qt.AlignmentFlag.AlignCenter)
             layout.addWidget(player_rank_icon_label, alignment=Qt.AlignmentFlag.AlignCenter)
-            self.right_side_widget_layout.addLayout(layout)
-        
+        side_layout = self.left_side_widget_layout if side == 'left' else self.right_side_widget_layout
+        # 位置0是顶部的stretch，玩家位依次排在其后
+        side_layout.insertWidget(1 + len(self.slots[side]), row_widget)
+        row_widget.hide()
+        slot = {'row': row_widget, 'rank_label': player_rank_icon_label, 'name_label': player_name_label, 'civ_label': player_civ_label,
+                'mark_combobox': player_mark_combobox, 'mmr_label': player_mmr_label}
+        self.slots[side].append(slot)
+        return slot
+
+    def bind(self, data):
+        # 绑定新的对局数据，只更新文字和图标，不重新创建控件
+        self.map_name, self.game_id, self.game_mode, self.player_data, self.kind, self.rating_diff, self.result, self.profile_id = data
+        game_type = '(天梯)' if 'rm' in self.kind else ''
+        self.mid_side_widget_map_name_label.setText(f'{self.icons.map_name(self.map_name)}{game_type}')
+        self.mid_side_widget_map_icon_label.setPixmap(self.get_map_icon(self.map_name, self.icon_size))
+        self.widgets_collection = {'mid_side_map_name': self.mid_side_widget_map_name_label,
+                                   'mid_side_map_icon': self.mid_side_widget_map_icon_label}
+        self.bind_result()
         players_count = len(self.player_data)
-        self.right_side_widget_layout.addStretch(1)
-        self.left_side_widget_layout.addStretch(1)
-        set_result_widget()
-        for index, player_info in enumerate(self.player_data):
-            player, civilization, profile_id, player_mmr, win_rate, kind = player_info
-            if index < players_count/2:
-                add_to_left_side(player, profile_id, civilization, player_mmr)
+        left_players = [player_info for index, player_info in enumerate(self.player_data) if index < players_count/2]
+        right_players = self.player_data[len(left_players):]
+        for side, players in (('left', left_players), ('right', right_players)):
+            while len(self.slots[side]) < len(players):
+                self.add_slot(side)
+            for index, slot in enumerate(self.slots[side]):
+                if index < len(players):
+                    self.bind_player(slot, players[index])
+                    slot['row'].show()
+                else:
+                    slot['row'].hide()
+
+    def bind_result(self):
+        if self.result:
+            if self.result == 'win':
+                style = "color: green"
+                result_text = "↑"
             else:
-                add_to_right_side(player, profile_id, civilization, player_mmr)
-        self.right_side_widget_layout.addStretch(1)
-        self.left_side_widget_layout.addStretch(1)
-    
-    def get_civ_icon(self, civ):
-        img = self.civilization_icon_dic.get(civ)
-        pixmap = QPixmap()
-        pixmap.loadFromData(img)
-        return pixmap
-    
-    def get_map_icon(self, map):
-        img = self.map_dic.get(map)[1]
-        pixmap = QPixmap()
-        pixmap.loadFromData(img)
-        return pixmap
-
-    def get_rank_icon(self, player_mmr):
-        if self.game_mode > 2:
-            rank_map = self.team_mmr_rank_map
+                style = "color: red"
+                result_text = "↓"
+            if self.rating_diff:
+                if self.rating_diff > 0:
+                    rating_diff_text = f'+{self.rating_diff}'
+                elif self.rating_diff <= 0:
+                    rating_diff_text = f'{self.rating_diff}'
+                else:
+                    rating_diff_text = '--'
+            else:
+                rating_diff_text = '--'
         else:
-            rank_map = self.solo_mmr_rank_map
-        for threshold, r in rank_map:
-            try:
-                if int(player_mmr) >= threshold:
-                    rank = r
-                    break
-            except Exception as e:
-                rank = 'unranked'
-        img = self.rank_icon_dic.get(rank)
-        pixmap = QPixmap()
-        pixmap.loadFromData(img)
-        return pixmap
-
-    def set_mmr_rank_map(self):
-        # 排位mmr对应段位表
-        self.team_mmr_rank_map = [
-            (1600, 'team_conqueror_3'),
-            (1500, 'team_conqueror_2'),
-            (1400, 'team_conqueror_1'),
-            (1350, 'team_diamond_3'),
-            (1300, 'team_diamond_2'),
-            (1200, 'team_diamond_1'),
-            (1150, 'team_platinum_3'),
-            (1100, 'team_platinum_2'),
-            (1000, 'team_platinum_1'),
-            (900, 'team_gold_3'),
-            (800, 'team_gold_2'),
-            (700, 'team_gold_1'),
-            (650, 'team_silver_3'),
-            (600, 'team_silver_2'),
-            (500, 'team_silver_1'),
-            (450, 'team_bronze_3'),
-            (400, 'team_bronze_2'),
-            (0, 'team_bronze_1')
-        ]
-        self.solo_mmr_rank_map = [
-            (1600, 'solo_conqueror_3'),
-            (1500, 'solo_conqueror_2'),
-            (1400, 'solo_conqueror_1'),
-            (1350, 'solo_diamond_3'),
-            (1300, 'solo_diamond_2'),
-            (1200, 'solo_diamond_1'),
-            (1150, 'solo_platinum_3'),
-            (1100, 'solo_platinum_2'),
-            (1000, 'solo_platinum_1'),
-            (900, 'solo_gold_3'),
-            (800, 'solo_gold_2'),
-            (700, 'solo_gold_1'),
-            (650, 'solo_silver_3'),
-            (600, 'solo_silver_2'),
-            (500, 'solo_silver_1'),
-            (450, 'solo_bronze_3'),
-            (400, 'solo_bronze_2'),
-            (0, 'solo_bronze_1')
-        ]
+            style = ""
+            result_text = " "
+            rating_diff_text = ' '
+        self.result_label.setText(result_text)
+        self.result_label.setStyleSheet(style)
+        self.rating_diff_label.setText(rating_diff_text)
+        self.rating_diff_label.setStyleSheet(style)
+
+    def bind_player(self, slot, player_info):
+        player, civilization, profile_id, player_mmr, win_rate, kind = player_info
+        if 'rm' in self.kind:
+            slot['rank_label'].setPixmap(self.get_rank_icon(player_mmr, self.rank_icon_size))
+        else:
+            slot['rank_label'].setPixmap(self.blank_rank_pixmap)
+        player_name = self.islongname(player)
+        player_name_label = slot['name_label']
+        player_name_label.id = profile_id
+        player_name_label.name = player
+        player_name_label.setText(player_name)
+        player_name_label.setToolTip(player if player_name != player else '')
+        player_name_label.setStyleSheet("color: rgb(114, 137, 218)" if self.profile_id == profile_id else "")
+        slot['civ_label'].setPixmap(self.get_civ_icon(civilization, self.civ_icon_size))
+        player_mark_combobox = slot['mark_combobox']
+        player_mark_combobox.profile_id = profile_id
+        if mark := self.player_mark_dic.get(profile_id):
+            player_mark_combobox.setCurrentIndex(mark[0])
+            player_mark_combobox.setToolTip(mark[1])
+        else:
+            player_mark_combobox.setCurrentIndex(-1)
+            player_mark_combobox.setToolTip('')
+        slot['mmr_label'].setText(player_mmr)
+        self.widgets_collection[profile_id] = slot
+
+    def activate_layouts(self):
+        # 离屏渲染或命中检测前，同步完成样式和所有布局的计算
+        self.ensurePolished()
+        for layout in [self.layout()] + self.findChildren(QLayout):
+            layout.activate()
+
+    def get_civ_icon(self, civ, size):
+        return self.icons.pixmap('civilization', civ, size.width(), size.height())
     
+    def get_map_icon(self, map, size):
+        return self.icons.pixmap('map', map, size.width(), size.height())
+
+    def get_rank_icon(self, player_mmr, size):
+        return rank.rank_pixmap(self.icons, player_mmr, self.game_mode, size.width(), size.height())
+
+
+class GameHistoryModel(QAbstractListModel):
+    # 对局历史数据模型，按game_id倒序保存 history.history_data 格式的对局数据
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.games = []
+        self.keys = []  # 与games一一对应的 -game_id，升序排列，用于bisect查找插入位置
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.games)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or not 0 <= index.row() < len(self.games):
+            return None
+        if role == Qt.ItemDataRole.UserRole:
+            return self.games[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return str(self.games[index.row()][1])
+        return None
+
+    def add_games(self, data_list, max_count):
+        # 逐条按序插入：二分查找位置后只通知视图插入一行，已存在的对局原位更新；返回被更新的已有对局数量
+        updated = 0
+        for data in data_list:
+            key = -int(data[1])
+            row = bisect.bisect_left(self.keys, key)
+            if row < len(self.keys) and self.keys[row] == key:
+                self.games[row] = data
+                self.dataChanged.emit(self.index(row), self.index(row))
+                updated += 1
+                continue
+            if row >= max_count:
+                continue
+            self.beginInsertRows(QModelIndex(), row, row)
+            self.keys.insert(row, key)
+            self.games.insert(row, data)
+            self.endInsertRows()
+        self.trim(max_count)
+        return updated
+
+    def trim(self, max_count):
+        if len(self.games) > max_count:
+            self.beginRemoveRows(QModelIndex(), max_count, len(self.games) - 1)
+            del self.games[max_count:]
+            del self.keys[max_count:]
+            self.endRemoveRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self.games = []
+        self.keys = []
+        self.endResetModel()
+
+
+class GameHistoryDelegate(QStyledItemDelegate):
+    # 对局历史绘制代理：只创建一张不显示的卡片，绘制某一行时绑定该行数据后渲染到列表中
+    # 渲染结果按对局缓存在代理自己的LRU缓存中（不占用存放图标的全局QPixmapCache），点击和提示通过卡片上对应位置的控件处理
+    def __init__(self, icons, apply_signal, player_mark_dic, *args, max_cached=24, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.icons = icons
+        self.apply_signal = apply_signal
+        self.player_mark_dic = player_mark_dic
+        self.card = None
+        self.version = 0
+        self.bound = None
+        self.max_cached = max_cached
+        self.rendered = OrderedDict()  # {(game_id, dpr): QPixmap}
+
+    def invalidate(self):
+        # 玩家标记或对局数据变化后，丢弃已缓存的渲染结果
+        self.version += 1
+        self.rendered.clear()
+
+    def bind_card(self, index):
+        data = index.data(Qt.ItemDataRole.UserRole)
+        if self.card is None:
+            self.card = GameHistoryWidget(self.icons, data, self.apply_signal, self.player_mark_dic, parent=self.parent())
+            self.card.hide()
+        elif self.bound != (data[1], self.version):
+            self.card.bind(data)
+        self.bound = (data[1], self.version)
+        self.card.activate_layouts()
+        return self.card
+
+    def widget_at(self, index, option, pos):
+        card = self.bind_card(index)
+        widget = card.childAt(pos - option.rect.topLeft())
+        return card, widget
+
+    def sizeHint(self, option, index):
+        return QSize(760, 150)
+
+    def paint(self, painter, option, index):
+        data = index.data(Qt.ItemDataRole.UserRole)
+        if data is None:
+            return
+        dpr = painter.device().devicePixelRatioF()
+        key = (data[1], dpr)
+        pixmap = self.rendered.get(key)
+        if pixmap is None:
+            card = self.bind_card(index)
+            pixmap = QPixmap(card.size() * dpr)
+            pixmap.setDevicePixelRatio(dpr)
+            pixmap.fill(Qt.transparent)
+            card.render(pixmap, QPoint(), QRegion(), QWidget.RenderFlag.DrawChildren)
+            self.rendered[key] = pixmap
+            while len(self.rendered) > self.max_cached:
+                self.rendered.popitem(last=False)
+        else:
+            self.rendered.move_to_end(key)
+        painter.drawPixmap(option.rect.topLeft(), pixmap)
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() in (QEvent.Type.MouseButtonPress, QEvent.Type.MouseMove) and index.isValid():
+            card, widget = self.widget_at(index, option, event.position().toPoint())
+            label = widget if isinstance(widget, ClickableLabel) else None
+            viewport = self.parent().viewport()
+            if event.type() == QEvent.Type.MouseMove:
+                viewport.setCursor(Qt.CursorShape.PointingHandCursor if label else Qt.CursorShape.ArrowCursor)
+            elif label is not None and event.button() == Qt.MouseButton.LeftButton:
+                label.clicked.emit((label.id, label.name))
+                return True
+        return super().editorEvent(event, model, option, index)
+
+    def helpEvent(self, event, view, option, index):
+        if event.type() == QEvent.Type.ToolTip and index.isValid():
+            card, widget = self.widget_at(index, option, event.pos())
+            while widget is not None and widget is not card and not widget.toolTip():
+                widget = widget.parentWidget()
+            if widget is not None and widget is not card:
+                QToolTip.showText(event.globalPos(), widget.toolTip(), view)
+            else:
+                QToolTip.hideText()
+            return True
+        return super().helpEvent(event, view, option, index)
+
+
 class ClickableLabel(QLabel):
     clicked = Signal(tuple)
     
@@ -13,6 +13,7 @@ from settings import Settings
 # noinspection PyPackages
 from . import window_rc
 from . import my_widgets
+from .. import rank
 from PySide6.QtGui import *
 from PySide6.QtCore import *
 from PySide6.QtWidgets import *
@@ -30,20 +31,18 @@ class MyWindow(QMainWindow):
     keyboard_single = Signal(str)
     new_version_signal = Signal()
 
-    def __init__(self, settings, civilization_icon_dic, map_dic, rank_icon_dic, database_queue, player_mark_dic, *args, **kwargs):
+    def __init__(self, settings, icons, database_queue, player_mark_dic, game_store, search_cache, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.setAttribute(Qt.WidgetAttribute.WA_TranslucentBackground)
         self.setWindowFlag(Qt.WindowType.FramelessWindowHint)
         self.dragging, self.location, self.resize_dragging, self.edge_size = False, None, False, 8
         self.setWindowTitle('Aoe4Mmr')
 
-        self.civilization_icon_dic = civilization_icon_dic
-        self.rank_icon_dic = rank_icon_dic
+        self.icons = icons
         self.database_queue = database_queue
         self.player_mark_dic = player_mark_dic
         self.settings = settings
         self.mouse = Controller()
-        self.map_dic = map_dic
         self.cursor_signal.connect(self.set_resize_cursor)
         self.gui_reload_signal.connect(self.gui_reload)
         self.keyboard_single.connect(self.on_hotkey_changed)
@@ -54,8 +53,8 @@ class MyWindow(QMainWindow):
         self.new_version_signal.connect(self.on_new_version_founded)
         self.toggle_window_signal.connect(self.toggle_window)
         self.menu_page = my_widgets.MenuPage(self.add_new_account_signal, self.settings_changed_signal, self.settings.max_show_game_history,
-                                             self.settings.max_accounts, self.settings.picked_profile_id, self.civilization_icon_dic,
-                                             self.map_dic, self.rank_icon_dic, self.database_queue, self.player_mark_dic, parent=self, ObjectName="menu_page")
+                                             self.settings.max_accounts, self.settings.picked_profile_id, self.icons, self.database_queue, self.player_mark_dic, game_store,
+                                             search_cache, self.settings.search_debounce_ms, parent=self, ObjectName="menu_page")
         self.menu_page.apply_signal.connect(self.apply_new)
         self.left_menu = my_widgets.LeftMenu(parent=self, pages=self.menu_page)
         
@@ -483,19 +482,19 @@ class MmrWindow(QMainWindow):
     toggle_window_signal = Signal()
     gui_reload_signal = Signal(tuple)
     settings_changed_signal = Signal(tuple)
+    player_mark_reload_signal = Signal(dict)
     
-    def __init__(self, tracking_id, civilization_icon_dic, rank_icon_dic, window_location, player_mark_dic, *args, **kwargs):
+    def __init__(self, tracking_id, icons, window_location, player_mark_dic, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.dragging = False
         self.tracking_id = tracking_id
-        self.civilization_icon_dic = civilization_icon_dic
+        self.icons = icons
         self.player_mark_dic = player_mark_dic
-        self.rank_icon_dic = rank_icon_dic
         self.enable_dragging = False
         self.resize(965, 190)
         self.window_location = window_location
-        self.set_mmr_rank_map()
         self.gui_reload_signal.connect(self.gui_reload)
+        self.player_mark_reload_signal.connect(self.merge_player_marks)
         self.toggle_window_signal.connect(self.toggle_window)
         self.hide_timer = QTimer(self)
         self.hide_timer.setInterval(300000)
@@ -507,76 +506,18 @@ class MmrWindow(QMainWindow):
     
     def player_icon(self, civilization):
         # 根据文明返回图标
-        pixmap = QPixmap()
-        pixmap.loadFromData(self.civilization_icon_dic.get(civilization))
+        icon = self.icons.pixmap('civilization', civilization, 36, 18)
         player_icon = QGraphicsScene()
-        icon = pixmap.scaled(36, 18)
         player_icon.addPixmap(icon)
         player_icon.setSceneRect(0, 0, 36, 18)
         return player_icon
     
-    def set_mmr_rank_map(self):
-        # 排位mmr对应段位表
-        self.team_mmr_rank_map = [
-            (1600, 'team_conqueror_3'),
-            (1500, 'team_conqueror_2'),
-            (1400, 'team_conqueror_1'),
-            (1350, 'team_diamond_3'),
-            (1300, 'team_diamond_2'),
-            (1200, 'team_diamond_1'),
-            (1150, 'team_platinum_3'),
-            (1100, 'team_platinum_2'),
-            (1000, 'team_platinum_1'),
-            (900, 'team_gold_3'),
-            (800, 'team_gold_2'),
-            (700, 'team_gold_1'),
-            (650, 'team_silver_3'),
-            (600, 'team_silver_2'),
-            (500, 'team_silver_1'),
-            (450, 'team_bronze_3'),
-            (400, 'team_bronze_2'),
-            (0, 'team_bronze_1')
-        ]
-        self.solo_mmr_rank_map = [
-            (1600, 'solo_conqueror_3'),
-            (1500, 'solo_conqueror_2'),
-            (1400, 'solo_conqueror_1'),
-            (1350, 'solo_diamond_3'),
-            (1300, 'solo_diamond_2'),
-            (1200, 'solo_diamond_1'),
-            (1150, 'solo_platinum_3'),
-            (1100, 'solo_platinum_2'),
-            (1000, 'solo_platinum_1'),
-            (900, 'solo_gold_3'),
-            (800, 'solo_gold_2'),
-            (700, 'solo_gold_1'),
-            (650, 'solo_silver_3'),
-            (600, 'solo_silver_2'),
-            (500, 'solo_silver_1'),
-            (450, 'solo_bronze_3'),
-            (400, 'solo_bronze_2'),
-            (0, 'solo_bronze_1')
-        ]
-    
     def player_rank(self, player_mmr, game_mode=8):
         # 根据玩家mmr返回段位图标
-        if game_mode > 2:
-            map = self.team_mmr_rank_map
-        else:
-            map = self.solo_mmr_rank_map
-        for threshold, r in map:
-            try:
-                if int(player_mmr) >= threshold:
-                    rank = r
-                    break
-            except:
-                rank = 'unranked'
-        pixmap = QPixmap()
-        pixmap.loadFromData(self.rank_icon_dic.get(rank))
-        if pixmap.isNull():
+        icon = rank.rank_pixmap(self.icons, player_mmr, game_mode, 26, 40)
+        if icon.isNull():
             return
         rank_icon = QGraphicsScene()
-        icon = pixmap.scaled(26, 40)
         rank_icon.addPixmap(icon)
         rank_icon.setSceneRect(0, 0, 26, 40)
         return rank_icon
@@ -936,6 +877,12 @@ class MmrWindow(QMainWindow):
             }
         """)
 
+    def merge_player_marks(self, player_marks):
+        # 合并后台读取的玩家标记，界面上已设置的标记比数据库中的更新，不覆盖
+        for profile_id, mark in player_marks.items():
+            self.player_mark_dic.setdefault(profile_id, mark)
+        self.player_mark_reload()
+
     def player_mark_reload(self):
         mark_combobox_list = [values for key, values in self.mark_combobox_dic.items()]
         for profile_id, values in self.player_mark_dic.items():
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# Author: B_Snowflake
+# Date: 2026/10/18
+# LastEditTime: 2026/10/18
+
+import os
+import sys
+import time
+import select
+import threading
+from . import win32
+from PySide6.QtCore import *
+
+
+class WindowsBackend:
+    # Windows：Toolhelp32快照查找进程，OpenProcess + WaitForSingleObject等待进程退出
+    def find_process(self, process_name):
+        return win32.find_process(process_name)
+
+    def open_process(self, pid):
+        return win32.open_process(pid)
+
+    def wait_exit(self, handle, pid):
+        try:
+            win32.wait_process(handle)
+        finally:
+            win32.close_handle(handle)
+
+
+class LinuxBackend:
+    # Linux（Wine/Proton）：遍历/proc查找进程，通过pidfd等待进程退出；内核不支持pidfd时轮询/proc/<pid>
+    poll_interval = 1
+
+    def find_process(self, process_name):
+        process_name = process_name.lower()
+        try:
+            pids = [int(name) for name in os.listdir('/proc') if name.isdigit()]
+        except OSError:
+            return None
+        for pid in pids:
+            try:
+                with open(f'/proc/{pid}/cmdline', 'rb') as f:
+                    argv0 = f.read().split(b'\0', 1)[0].decode(errors='ignore')
+            except OSError:
+                continue
+            if argv0.replace('\\', '/').rsplit('/', 1)[-1].lower() == process_name:
+                return pid
+        return None
+
+    def open_process(self, pid):
+        try:
+            return os.pidfd_open(pid)
+        except (AttributeError, OSError):
+            return -1
+
+    def wait_exit(self, handle, pid):
+        if handle >= 0:
+            try:
+                poller = select.poll()
+                poller.register(handle, select.POLLIN)
+                poller.poll()
+            finally:
+                os.close(handle)
+            return
+        while os.path.exists(f'/proc/{pid}'):
+            time.sleep(self.poll_interval)
+
+
+def create_backend():
+    if sys.platform == 'win32':
+        return WindowsBackend()
+    return LinuxBackend()
+
+
+class ProcessWatcher(QObject):
+    # 游戏进程监视：游戏未运行时每scan_interval秒扫描一次进程列表；找到进程后由后台线程等待该进程退出，退出时立即通知
+    # 无法打开进程句柄时（如权限不足）继续定时扫描，扫描不到该进程时视为退出
+    # 状态变化通过信号回到主线程
+    process_started_signal = Signal(int)
+    process_exited_signal = Signal(int)
+
+    def __init__(self, process_name='RelicCardinal.exe', scan_interval=20, parent=None):
+        super().__init__(parent)
+        self.process_name = process_name
+        self.backend = create_backend()
+        self.pid = None
+        self.scan_timer = QTimer(self)
+        self.scan_timer.setInterval(scan_interval * 1000)
+        self.scan_timer.timeout.connect(self.scan)
+        self.process_exited_signal.connect(self.on_process_exited)
+
+    def start(self):
+        self.scan()
+        if self.pid is None:
+            self.scan_timer.start()
+
+    def stop(self):
+        self.scan_timer.stop()
+
+    def is_running(self):
+        # 返回缓存的进程状态，不会重新扫描
+        return self.pid is not None
+
+    def scan(self):
+        try:
+            pid = self.backend.find_process(self.process_name)
+        except Exception as e:
+            print(f'error when scan process: {e}')
+            return
+        if self.pid is not None:
+            # 没有进程句柄，只能通过扫描判断进程是否还在运行
+            if pid == self.pid:
+                return
+            self.process_exited_signal.emit(self.pid)
+        if pid is None:
+            return
+        handle = self.backend.open_process(pid)
+        self.pid = pid
+        if handle is None:
+            self.scan_timer.start()
+        else:
+            self.scan_timer.stop()
+            threading.Thread(target=self.wait_exit, args=(handle, pid), daemon=True).start()
+        self.process_started_signal.emit(pid)
+
+    def wait_exit(self, handle, pid):
+        try:
+            self.backend.wait_exit(handle, pid)
+        except Exception as e:
+            print(f'error when wait process: {e}')
+        self.process_exited_signal.emit(pid)
+
+    def on_process_exited(self, pid):
+        if pid != self.pid:
+            return
+        self.pid = None
+        self.scan_timer.start()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# Author: B_Snowflake
+# Date: 2026/10/18
+# LastEditTime: 2026/10/18
+
+import bisect
+
+UNRANKED = 'unranked'
+
+# 排位mmr对应段位表，按分数下限升序排列，模块加载时生成一次
+RANK_TABLE = [
+    (0, 'bronze_1'),
+    (400, 'bronze_2'),
+    (450, 'bronze_3'),
+    (500, 'silver_1'),
+    (600, 'silver_2'),
+    (650, 'silver_3'),
+    (700, 'gold_1'),
+    (800, 'gold_2'),
+    (900, 'gold_3'),
+    (1000, 'platinum_1'),
+    (1100, 'platinum_2'),
+    (1150, 'platinum_3'),
+    (1200, 'diamond_1'),
+    (1300, 'diamond_2'),
+    (1350, 'diamond_3'),
+    (1400, 'conqueror_1'),
+    (1500, 'conqueror_2'),
+    (1600, 'conqueror_3'),
+]
+THRESHOLDS = [threshold for threshold, _ in RANK_TABLE]
+SOLO_RANKS = [f'solo_{tier}' for _, tier in RANK_TABLE]
+TEAM_RANKS = [f'team_{tier}' for _, tier in RANK_TABLE]
+
+
+def rank_name(player_mmr, game_mode=8):
+    # 根据玩家mmr返回段位图标名称，game_mode为对局人数，大于2时使用团队排位段位
+    try:
+        mmr = int(player_mmr)
+    except (TypeError, ValueError):
+        return UNRANKED
+    index = bisect.bisect_right(THRESHOLDS, mmr) - 1
+    if index < 0:
+        return UNRANKED
+    return TEAM_RANKS[index] if game_mode > 2 else SOLO_RANKS[index]
+
+
+def rank_pixmap(icons, player_mmr, game_mode, width, height):
+    # 段位图标按 (段位, 模式, 尺寸) 缓存在图标库的QPixmapCache中，同一段位只解码一次
+    return icons.pixmap('rank', rank_name(player_mmr, game_mode), width, height)
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# Author: B_Snowflake
+# Date: 2026/10/18
+# LastEditTime: 2026/10/18
+
+import time
+import random
+import threading
+from PySide6.QtCore import *
+
+# 轮询结果状态，由轮询函数返回
+POLL_IDLE = 'idle'              # 没有新对局
+POLL_CONFIRMING = 'confirming'  # 发现新对局，处于数据校验阶段
+POLL_ONGOING = 'ongoing'        # 已确认的对局正在进行中
+POLL_ERROR = 'error'            # 请求异常
+POLL_THROTTLED = 'throttled'    # 被接口限流（429）
+
+
+class PollScheduler(QObject):
+    # 自适应轮询调度器：由QTimer驱动，根据上一次轮询的状态决定下一次的轮询间隔
+    # 轮询函数在后台线程中执行，完成后通过信号回到主线程安排下一次轮询
+    poll_finished_signal = Signal(str)
+
+    def __init__(self, poll_func, fast_interval=3, normal_interval=10, max_interval=60, max_error_interval=300,
+                 warmup_period=60, parent=None):
+        super().__init__(parent)
+        self.poll_func = poll_func
+        self.fast_interval = fast_interval
+        self.normal_interval = normal_interval
+        self.max_interval = max_interval
+        self.max_error_interval = max_error_interval
+        self.warmup_period = warmup_period  # 游戏进程出现后的快速轮询时长
+        self.active = False
+        self.polling = False
+        self.wake_pending = False
+        self.started_at = 0
+        self.ongoing_count = 0
+        self.error_count = 0
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.run)
+        self.poll_finished_signal.connect(self.on_poll_finished)
+
+    def start(self):
+        # 游戏进程出现时调用，立即轮询并进入快速轮询阶段
+        self.active = True
+        self.started_at = time.monotonic()
+        self.ongoing_count = 0
+        self.error_count = 0
+        self.wake()
+
+    def stop(self):
+        self.active = False
+        self.wake_pending = False
+        self.timer.stop()
+
+    def wake(self):
+        # 立即执行一次轮询（如有轮询正在执行，则在其完成后立即再执行一次）
+        if not self.active:
+            return
+        if self.polling:
+            self.wake_pending = True
+            return
+        self.timer.start(0)
+
+    def run(self):
+        if not self.active or self.polling:
+            return
+        self.polling = True
+        threading.Thread(target=self.poll, daemon=True).start()
+
+    def poll(self):
+        try:
+            state = self.poll_func()
+        except Exception as e:
+            print(f'error when poll: {e}')
+            state = POLL_ERROR
+        self.poll_finished_signal.emit(state or POLL_IDLE)
+
+    def on_poll_finished(self, state):
+        self.polling = False
+        if not self.active:
+            return
+        interval = self.next_interval(state)
+        if self.wake_pending:
+            self.wake_pending = False
+            interval = 0
+        self.timer.start(int(interval * 1000))
+
+    def next_interval(self, state):
+        if state in (POLL_ERROR, POLL_THROTTLED):
+            # 异常或限流时指数退避，并加入随机抖动
+            self.error_count += 1
+            base = self.normal_interval * (4 if state == POLL_THROTTLED else 1)
+            interval = min(base * 2 ** (self.error_count - 1), self.max_error_interval)
+            return interval * random.uniform(0.5, 1.0)
+        self.error_count = 0
+        if state == POLL_CONFIRMING:
+            self.ongoing_count = 0
+            return self.fast_interval
+        if state == POLL_ONGOING:
+            # 已知对局进行中，逐步拉长轮询间隔
+            self.ongoing_count += 1
+            return min(self.normal_interval * 2 ** (self.ongoing_count - 1), self.max_interval)
+        self.ongoing_count = 0
+        if time.monotonic() - self.started_at < self.warmup_period:
+            return self.fast_interval
+        return self.normal_interval
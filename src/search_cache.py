@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# Author: B_Snowflake
+# Date: 2026/10/18
+# LastEditTime: 2026/10/18
+
+import json
+import time
+from . import cache
+from . import database
+
+
+def normalize_query(query):
+    return ' '.join(query.split()).lower()
+
+
+class PlayerSearchCache:
+    # 玩家搜索结果缓存：内存TTL缓存 + 用户数据库player_search表，键为规范化后的搜索词
+    # 结果条数少于接口每页数量时，说明该搜索词的所有匹配玩家都已返回(complete)，更长的搜索词可直接在本地过滤得到
+    def __init__(self, database_path, database_queue, ttl=3600, max_age=30 * 86400):
+        self.database_path = database_path
+        self.database_queue = database_queue
+        self.ttl = ttl            # 超过ttl秒的结果需要重新请求
+        self.max_age = max_age    # 网络不可用时，max_age秒内的过期结果仍可使用
+        self.memory = cache.TTLCache(maxsize=256, ttl=ttl)
+
+    def get(self, query, allow_stale=False):
+        # 返回玩家列表 [(profile_id, name, last_game_at)]，没有可用缓存时返回None
+        query = normalize_query(query)
+        prefixes = [query[:length] for length in range(len(query), 0, -1)]
+        for prefix in prefixes:
+            entry = self.memory.get(prefix)
+            if entry and (prefix == query or entry['complete']):
+                return self.filter(entry['players'], prefix, query)
+        now = int(time.time())
+        min_time = now - (self.max_age if allow_stale else self.ttl)
+        try:
+            conn, cur = database.connect(self.database_path, readonly=True)
+            try:
+                rows = cur.execute(f'select query, players, complete, create_time from player_search where query in ({",".join("?" * len(prefixes))}) '
+                                   f'and create_time >= ?', (*prefixes, min_time)).fetchall()
+            finally:
+                conn.close()
+        except Exception as e:
+            print(f'error when read search cache: {e}')
+            return None
+        entries = {row[0]: {'players': [tuple(player) for player in json.loads(row[1])], 'complete': bool(row[2]), 'create_time': row[3]} for row in rows}
+        for prefix in prefixes:
+            entry = entries.get(prefix)
+            if entry and (prefix == query or entry['complete']):
+                if entry['create_time'] >= now - self.ttl:
+                    self.memory.put(prefix, entry, ttl=entry['create_time'] + self.ttl - now)
+                return self.filter(entry['players'], prefix, query)
+        return None
+
+    def put(self, query, players, complete):
+        query = normalize_query(query)
+        now = int(time.time())
+        entry = {'players': [tuple(player) for player in players], 'complete': complete, 'create_time': now}
+        self.memory.put(query, entry)
+        self.database_queue.put([
+            ('INSERT OR REPLACE INTO player_search (query, players, complete, create_time) VALUES (?, ?, ?, ?)',
+             (query, json.dumps(entry['players'], ensure_ascii=False), int(complete), now)),
+            ('DELETE FROM player_search WHERE create_time < ?', (now - self.max_age,)),
+        ])
+
+    @staticmethod
+    def filter(players, prefix, query):
+        if prefix == query:
+            return list(players)
+        return [player for player in players if query in normalize_query(player[1])]
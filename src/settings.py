@@ -22,6 +22,8 @@ class Settings:
     show_gui_when_startup: bool = True
     window_location: list = field(default_factory=list)
     max_show_game_history: int = 10
+    search_debounce_ms: int = 300
+    display_timezone: str = "Asia/Shanghai"
     max_accounts: int = 6
     picked_profile_id: str = ""
     profile_id: dict[str, ProfileId] = field(default_factory=dict)
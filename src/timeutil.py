@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# Author: B_Snowflake
+# Date: 2026/10/18
+# LastEditTime: 2026/10/18
+
+import pytz
+from datetime import datetime, timezone
+from functools import lru_cache
+
+DEFAULT_TIMEZONE = 'Asia/Shanghai'
+DISPLAY_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# 界面显示使用的时区，启动时由设置(display_timezone)指定
+display_timezone = DEFAULT_TIMEZONE
+
+
+@lru_cache(maxsize=None)
+def get_timezone(name):
+    return pytz.timezone(name)
+
+
+def set_display_timezone(name):
+    global display_timezone
+    try:
+        get_timezone(name)
+        display_timezone = name
+    except pytz.UnknownTimeZoneError:
+        print(f'unknown timezone: {name}, use {DEFAULT_TIMEZONE}')
+        display_timezone = DEFAULT_TIMEZONE
+
+
+def parse_timestamp(value):
+    # 将接口返回的ISO 8601时间（如 2024-01-01T08:00:00.000Z）转换为整数时间戳，内部统一使用时间戳
+    if not value:
+        return None
+    if value.endswith('Z'):
+        value = value[:-1] + '+00:00'
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+
+def format_timestamp(timestamp, fmt=DISPLAY_FORMAT):
+    # 仅在显示时按显示时区格式化
+    if timestamp is None:
+        return '--'
+    return datetime.fromtimestamp(timestamp, get_timezone(display_timezone)).strftime(fmt)
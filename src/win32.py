@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# Author: B_Snowflake
+# Date: 2026/10/18
+# LastEditTime: 2026/10/18
+
+import ctypes
+import threading
+from contextlib import closing
+from ctypes import wintypes
+
+TH32CS_SNAPPROCESS = 0x00000002
+SYNCHRONIZE = 0x00100000
+INFINITE = 0xFFFFFFFF
+INVALID_HANDLE_VALUE = ctypes.c_void_p(-1).value
+
+
+class PROCESSENTRY32W(ctypes.Structure):
+    _fields_ = [
+        ("dwSize", wintypes.DWORD),
+        ("cntUsage", wintypes.DWORD),
+        ("th32ProcessID", wintypes.DWORD),
+        ("th32DefaultHeapID", ctypes.c_void_p),
+        ("th32ModuleID", wintypes.DWORD),
+        ("cntThreads", wintypes.DWORD),
+        ("th32ParentProcessID", wintypes.DWORD),
+        ("pcPriClassBase", ctypes.c_long),
+        ("dwFlags", wintypes.DWORD),
+        ("szExeFile", ctypes.c_wchar * wintypes.MAX_PATH),
+    ]
+
+
+_kernel32 = None
+_kernel32_lock = threading.Lock()
+
+
+def kernel32():
+    # 首次使用时加载kernel32并设置函数签名，之后一直复用
+    global _kernel32
+    with _kernel32_lock:
+        if _kernel32 is None:
+            dll = ctypes.WinDLL("kernel32", use_last_error=True)
+            dll.CreateToolhelp32Snapshot.argtypes = [wintypes.DWORD, wintypes.DWORD]
+            dll.CreateToolhelp32Snapshot.restype = wintypes.HANDLE
+            dll.Process32FirstW.argtypes = [wintypes.HANDLE, ctypes.POINTER(PROCESSENTRY32W)]
+            dll.Process32FirstW.restype = wintypes.BOOL
+            dll.Process32NextW.argtypes = [wintypes.HANDLE, ctypes.POINTER(PROCESSENTRY32W)]
+            dll.Process32NextW.restype = wintypes.BOOL
+            dll.OpenProcess.argtypes = [wintypes.DWORD, wintypes.BOOL, wintypes.DWORD]
+            dll.OpenProcess.restype = wintypes.HANDLE
+            dll.WaitForSingleObject.argtypes = [wintypes.HANDLE, wintypes.DWORD]
+            dll.WaitForSingleObject.restype = wintypes.DWORD
+            dll.CloseHandle.argtypes = [wintypes.HANDLE]
+            dll.CloseHandle.restype = wintypes.BOOL
+            _kernel32 = dll
+        return _kernel32
+
+
+def iter_processes():
+    # 遍历进程快照，逐个返回 (pid, 进程名)；调用方找到目标后可提前结束，生成器关闭时释放快照句柄
+    dll = kernel32()
+    snapshot = dll.CreateToolhelp32Snapshot(TH32CS_SNAPPROCESS, 0)
+    if snapshot == INVALID_HANDLE_VALUE:
+        raise ctypes.WinError(ctypes.get_last_error())
+    try:
+        entry = PROCESSENTRY32W()
+        entry.dwSize = ctypes.sizeof(PROCESSENTRY32W)
+        found = dll.Process32FirstW(snapshot, ctypes.byref(entry))
+        while found:
+            yield entry.th32ProcessID, entry.szExeFile
+            found = dll.Process32NextW(snapshot, ctypes.byref(entry))
+    finally:
+        dll.CloseHandle(snapshot)
+
+
+def find_process(process_name):
+    # 按进程名查找，返回第一个匹配进程的pid
+    process_name = process_name.lower()
+    with closing(iter_processes()) as processes:
+        for pid, exe_file in processes:
+            if exe_file.lower() == process_name:
+                return pid
+    return None
+
+
+def get_process_name(pid):
+    with closing(iter_processes()) as processes:
+        for process_id, exe_file in processes:
+            if process_id == pid:
+                return exe_file
+    return None
+
+
+def open_process(pid, access=SYNCHRONIZE):
+    return kernel32().OpenProcess(access, False, pid) or None
+
+
+def wait_process(handle, timeout=INFINITE):
+    return kernel32().WaitForSingleObject(handle, timeout)
+
+
+def close_handle(handle):
+    return kernel32().CloseHandle(handle)